@@ -34,6 +34,17 @@ create table if not exists sensor_readings (
 );
 select create_hypertable('sensor_readings','ts', if_not_exists => true);
 create index if not exists idx_sr_sensor_ts on sensor_readings(sensor_id, ts desc);
+-- One reading per sensor and timestamp; lets ingestion upsert with merge-duplicates.
+-- Databases that predate the index may hold duplicates, so keep the latest row of each first
+do $$
+begin
+  if not exists (select 1 from pg_indexes where indexname = 'uq_sr_sensor_ts') then
+    delete from sensor_readings a
+      using sensor_readings b
+      where a.sensor_id = b.sensor_id and a.ts = b.ts and a.id < b.id;
+  end if;
+end $$;
+create unique index if not exists uq_sr_sensor_ts on sensor_readings(sensor_id, ts);
 
 -- Alerts
 create table if not exists alerts (
@@ -96,6 +107,53 @@ create table if not exists nigeria_states (
   updated_at timestamptz default now()
 );
 
+-- Training data: a location's weather sensor readings pivoted to one row per timestamp
+-- (the latest reading wins when a sensor reports twice for the same timestamp)
+create or replace function training_weather_by_location(
+  p_lat double precision,
+  p_lon double precision,
+  p_from timestamptz,
+  p_to timestamptz
+)
+returns table (
+  ts timestamptz,
+  temperature double precision,
+  humidity double precision,
+  pressure double precision,
+  wind_speed double precision,
+  precipitation double precision,
+  rainfall_24h double precision,
+  rainfall_7d double precision,
+  soil_moisture double precision,
+  river_level double precision
+)
+language sql stable
+as $$
+  with readings as (
+    select r.id, r.ts, r.value, s.type,
+           -- ingestion stores raw as JSON text, which lands as a jsonb string
+           case when jsonb_typeof(r.raw) = 'string' then (r.raw #>> '{}')::jsonb else r.raw end as raw
+    from sensor_readings r
+    join sensors s on s.id = r.sensor_id
+    where s.lat = p_lat and s.lon = p_lon
+      and s.type in ('TEMP','HUMIDITY','PRESSURE','WIND','RAIN')
+      and r.ts between p_from and p_to
+  )
+  select ts,
+    (array_agg(value order by id desc) filter (where type = 'TEMP'))[1],
+    (array_agg(value order by id desc) filter (where type = 'HUMIDITY'))[1],
+    (array_agg(value order by id desc) filter (where type = 'PRESSURE'))[1],
+    (array_agg(value order by id desc) filter (where type = 'WIND'))[1],
+    (array_agg(value order by id desc) filter (where type = 'RAIN'))[1],
+    (array_agg((raw->>'rainfall_24h')::double precision order by id desc) filter (where raw ? 'rainfall_24h'))[1],
+    (array_agg((raw->>'rainfall_7d')::double precision order by id desc) filter (where raw ? 'rainfall_7d'))[1],
+    (array_agg((raw->>'soil_moisture')::double precision order by id desc) filter (where raw ? 'soil_moisture'))[1],
+    (array_agg((raw->>'river_level')::double precision order by id desc) filter (where raw ? 'river_level'))[1]
+  from readings
+  group by ts
+  order by ts;
+$$;
+
 -- RLS
 alter table profiles enable row level security;
 alter table sensors enable row level security;
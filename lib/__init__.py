@@ -0,0 +1 @@
+"""Python services shared by the API and scripts"""
@@ -0,0 +1,94 @@
+"""
+Persistence for saved model artifacts (models, scalers, binners), shared by
+ml_model.py and the Nigeria training pipeline
+
+Every artifact follows one policy:
+- Stored uncompressed and loaded with mmap_mode='r', so processes loading the same
+  file share its pages through the OS cache. MODEL_COMPRESS=1 stores them compressed
+  (lz4 when installed, else zlib) and loads them into memory instead, since compressed
+  pickles cannot be memory-mapped.
+- Written to a temporary file and renamed into place: readers never see a partial file,
+  and a process that mapped the old file keeps its inode rather than crashing (SIGBUS).
+- Verified against a CRC32 sidecar on load. Writers swap artifacts and sidecars while
+  holding artifact_lock() exclusively and loaders hold it shared, so a reader never
+  pairs an artifact with the sidecar of another version.
+"""
+import os
+import zlib
+from contextlib import contextmanager
+from typing import Any
+
+import joblib
+
+try:
+    import lz4  # noqa: F401  (enables joblib's lz4 compressor)
+    _COMPRESSOR = 'lz4'
+except ImportError:
+    _COMPRESSOR = 'zlib'
+
+try:
+    import fcntl
+except ImportError:  # Windows: artifact reads and writes are not serialized across processes
+    fcntl = None
+
+# Compressed artifacts are smaller to archive or ship but cannot be memory-mapped
+COMPRESS_ARTIFACTS = os.getenv('MODEL_COMPRESS') == '1'
+ARTIFACT_COMPRESSION = (_COMPRESSOR, 3) if COMPRESS_ARTIFACTS else 0
+ARTIFACT_MMAP_MODE = None if COMPRESS_ARTIFACTS else 'r'
+
+def file_crc32(path: str) -> str:
+    """CRC32 of a file as 8 hex digits"""
+    crc = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            crc = zlib.crc32(chunk, crc)
+    return f"{crc:08x}"
+
+def _replace_file(path: str, write):
+    """Create path by writing a temporary file in the same directory and renaming it over path"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _write_text(path: str, text: str):
+    """Write text to a file"""
+    with open(path, 'w') as f:
+        f.write(text)
+
+@contextmanager
+def artifact_lock(directory: str, shared: bool = False):
+    """Hold the lock that keeps artifacts and their sidecars consistent (shared for loading)"""
+    with open(os.path.join(directory, "artifacts.lock"), 'a') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def dump_artifact(obj: Any, path: str):
+    """Save a joblib artifact with its CRC32 sidecar; call under artifact_lock()"""
+    _replace_file(path, lambda tmp_path: joblib.dump(obj, tmp_path, compress=ARTIFACT_COMPRESSION))
+    _replace_file(f"{path}.crc32", lambda tmp_path: _write_text(tmp_path, file_crc32(path)))
+
+def remove_artifact(path: str):
+    """Delete an artifact and its CRC32 sidecar if present; call under artifact_lock()"""
+    for artifact_file in (path, f"{path}.crc32"):
+        if os.path.exists(artifact_file):
+            os.remove(artifact_file)
+
+def load_artifact(path: str) -> Any:
+    """Load a joblib artifact after checking its CRC32; call under artifact_lock(shared=True)"""
+    # Artifacts saved before checksums were introduced have no sidecar
+    if os.path.exists(f"{path}.crc32"):
+        with open(f"{path}.crc32") as f:
+            expected = f.read().strip()
+        if file_crc32(path) != expected:
+            raise ValueError(f"Checksum mismatch for {path}")
+    # Compressed files are detected and loaded into memory whatever mmap_mode says
+    return joblib.load(path, mmap_mode=ARTIFACT_MMAP_MODE)
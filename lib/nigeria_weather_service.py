@@ -3,23 +3,172 @@ Enhanced Weather Service for Nigeria
 Integrates with Open-Meteo API and Nigeria state/region mapping
 """
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import aiohttp
 import json
 import asyncio
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Awaitable, Callable, Optional, Tuple
 import logging
 from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
 import os
+from cachetools import TTLCache
+import threading
+import weakref
 from supabase import create_client, Client
+from postgrest.exceptions import APIError
 import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+    
+    def _dumps(obj: Any) -> str:
+        """Serialize to a compact JSON string with the native orjson encoder"""
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    
+    _loads = orjson.loads
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    def _dumps(obj: Any) -> str:
+        """Serialize to a JSON string"""
+        return json.dumps(obj)
+    
+    _loads = json.loads
+
+try:
+    from numba import njit, vectorize
+except ImportError:  # numba is optional; kernels run as plain Python without it
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+    
+    def vectorize(*args, **kwargs):
+        return lambda func: np.vectorize(func, otypes=[np.float64])
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@dataclass
+# River level multipliers by state flood risk
+FLOOD_RISK_FACTORS = MappingProxyType({
+    'AN': 2.0, 'BY': 2.0, 'DE': 2.0, 'RI': 2.0, 'LA': 2.0,  # Critical risk states
+    'AB': 1.5, 'AK': 1.5, 'CR': 1.5, 'EB': 1.5, 'ED': 1.5, 'IM': 1.5, 'OG': 1.5,  # High risk states
+    'BE': 1.5, 'TA': 1.5, 'AD': 1.5,  # High risk states
+    'FCT': 1.0, 'BA': 1.0, 'GO': 1.0, 'KD': 1.0, 'KW': 1.0, 'NA': 1.0, 'NI': 1.0,  # Medium risk states
+    'EK': 1.0, 'EN': 1.0, 'ON': 1.0, 'OS': 1.0, 'OY': 1.0, 'KE': 1.0,  # Medium risk states
+    'BO': 0.5, 'YO': 0.5, 'KN': 0.5, 'KT': 0.5, 'SO': 0.5, 'ZA': 0.5, 'PL': 0.5  # Low risk states
+})
+
+# Nigeria state coordinates (simplified), shared read-only by every service instance
+NIGERIA_STATES = MappingProxyType({
+    "AB": {"name": "Abia", "lat": 5.5333, "lon": 7.4833, "region": "South East"},
+    "AD": {"name": "Adamawa", "lat": 9.2000, "lon": 12.4833, "region": "North East"},
+    "AK": {"name": "Akwa Ibom", "lat": 5.0333, "lon": 7.9167, "region": "South South"},
+    "AN": {"name": "Anambra", "lat": 6.2107, "lon": 7.0743, "region": "South East"},
+    "BA": {"name": "Bauchi", "lat": 10.3158, "lon": 9.8442, "region": "North East"},
+    "BY": {"name": "Bayelsa", "lat": 4.9167, "lon": 6.2667, "region": "South South"},
+    "BE": {"name": "Benue", "lat": 7.7322, "lon": 8.5391, "region": "North Central"},
+    "BO": {"name": "Borno", "lat": 11.8333, "lon": 13.1500, "region": "North East"},
+    "CR": {"name": "Cross River", "lat": 4.9500, "lon": 8.3167, "region": "South South"},
+    "DE": {"name": "Delta", "lat": 6.2000, "lon": 6.7333, "region": "South South"},
+    "EB": {"name": "Ebonyi", "lat": 6.3333, "lon": 8.1000, "region": "South East"},
+    "ED": {"name": "Edo", "lat": 6.3333, "lon": 5.6167, "region": "South South"},
+    "EK": {"name": "Ekiti", "lat": 7.6167, "lon": 5.2167, "region": "South West"},
+    "EN": {"name": "Enugu", "lat": 6.4500, "lon": 7.5000, "region": "South East"},
+    "FCT": {"name": "Abuja", "lat": 9.0765, "lon": 7.3986, "region": "North Central"},
+    "GO": {"name": "Gombe", "lat": 10.2894, "lon": 11.1717, "region": "North East"},
+    "IM": {"name": "Imo", "lat": 5.4833, "lon": 7.0333, "region": "South East"},
+    "KD": {"name": "Kaduna", "lat": 10.5200, "lon": 7.4383, "region": "North West"},
+    "KN": {"name": "Kano", "lat": 12.0000, "lon": 8.5167, "region": "North West"},
+    "KT": {"name": "Katsina", "lat": 12.9908, "lon": 7.6019, "region": "North West"},
+    "KE": {"name": "Kebbi", "lat": 12.4500, "lon": 4.2000, "region": "North West"},
+    "KO": {"name": "Kogi", "lat": 7.8019, "lon": 6.7446, "region": "North Central"},
+    "KW": {"name": "Kwara", "lat": 8.5000, "lon": 4.5500, "region": "North Central"},
+    "LA": {"name": "Lagos", "lat": 6.5244, "lon": 3.3792, "region": "South West"},
+    "NA": {"name": "Nasarawa", "lat": 8.5000, "lon": 8.2000, "region": "North Central"},
+    "NI": {"name": "Niger", "lat": 9.6000, "lon": 6.5500, "region": "North Central"},
+    "OG": {"name": "Ogun", "lat": 7.1500, "lon": 3.3500, "region": "South West"},
+    "ON": {"name": "Ondo", "lat": 7.2500, "lon": 5.2000, "region": "South West"},
+    "OS": {"name": "Osun", "lat": 7.7667, "lon": 4.5667, "region": "South West"},
+    "OY": {"name": "Oyo", "lat": 7.3833, "lon": 3.9000, "region": "South West"},
+    "PL": {"name": "Plateau", "lat": 9.9167, "lon": 8.9000, "region": "North Central"},
+    "RI": {"name": "Rivers", "lat": 4.7500, "lon": 7.0000, "region": "South South"},
+    "SO": {"name": "Sokoto", "lat": 13.0667, "lon": 5.2333, "region": "North West"},
+    "TA": {"name": "Taraba", "lat": 8.9000, "lon": 11.3667, "region": "North East"},
+    "YO": {"name": "Yobe", "lat": 11.7500, "lon": 11.9667, "region": "North East"},
+    "ZA": {"name": "Zamfara", "lat": 12.1700, "lon": 6.6600, "region": "North West"}
+})
+
+# Per-state arrays in NIGERIA_STATES order, indexed through STATE_INDEX
+STATE_INDEX = MappingProxyType({code: i for i, code in enumerate(NIGERIA_STATES)})
+STATE_LATS = np.array([state['lat'] for state in NIGERIA_STATES.values()])
+STATE_LONS = np.array([state['lon'] for state in NIGERIA_STATES.values()])
+STATE_RISK_FACTORS = np.array([FLOOD_RISK_FACTORS.get(code, 1.0) for code in NIGERIA_STATES])
+
+# Maximum rows per sensor_readings upsert request
+INSERT_BATCH_SIZE = 10_000
+
+# Training data column for each weather sensor type
+SENSOR_TYPE_COLUMNS = {
+    'TEMP': 'temperature',
+    'HUMIDITY': 'humidity',
+    'PRESSURE': 'pressure',
+    'WIND': 'wind_speed',
+    'RAIN': 'precipitation'
+}
+
+# Derived values stored in each reading's raw payload and used for training
+RAW_TRAINING_FIELDS = ['rainfall_24h', 'rainfall_7d', 'soil_moisture', 'river_level']
+
+# PostgREST error codes meaning training_weather_by_location is not deployed
+MISSING_RPC_ERROR_CODES = ('PGRST202', '404')
+
+# Ufuncs, so single readings and whole batches share one definition
+@vectorize(['f8(f8, f8, f8)'], cache=True, fastmath=True)
+def _soil_moisture_kernel(temperature, rainfall_24h, humidity):
+    """Soil moisture estimate from temperature, 24h rainfall and humidity, clipped to 0-1"""
+    # Simple model: higher rainfall and humidity = higher soil moisture
+    # Higher temperature = more evaporation = lower soil moisture
+    base_moisture = 0.3
+    rainfall_factor = min(0.4, rainfall_24h / 50)  # Max 0.4 from rainfall
+    humidity_factor = (humidity - 50) / 100 * 0.2  # Humidity contribution
+    temperature_factor = max(0.0, (30 - temperature) / 20 * 0.1)  # Temperature effect
+    
+    soil_moisture = base_moisture + rainfall_factor + humidity_factor + temperature_factor
+    return max(0.0, min(1.0, soil_moisture))
+
+@vectorize(['f8(f8, f8, f8)'], cache=True, fastmath=True)
+def _river_level_kernel(rainfall_7d, risk_factor, noise):
+    """River level estimate from 7d rainfall and the state's risk factor, at least 1m"""
+    return max(1.0, 2.0 + rainfall_7d * 0.1 * risk_factor + noise)
+
+@lru_cache(maxsize=256)
+def _parse_timestamp(value: str) -> datetime:
+    """Parse an Open-Meteo ISO timestamp; states in one batch share a few distinct values"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def _parse_raw(raw: Any) -> Dict[str, Any]:
+    """Decode a reading's raw payload, which may arrive as JSON text or already decoded"""
+    if isinstance(raw, dict):
+        return raw
+    if not raw:
+        return {}
+    try:
+        return _loads(raw)
+    except (json.JSONDecodeError, TypeError):
+        return {}
+
+@dataclass(frozen=True)
 class NigeriaWeatherData:
     """Weather data structure for Nigeria locations"""
+    # Explicit __slots__ (dataclass slots=True needs Python 3.10) keep instances small
+    __slots__ = ('timestamp', 'latitude', 'longitude', 'state_code', 'region', 'temperature',
+                 'humidity', 'pressure', 'wind_speed', 'wind_direction', 'precipitation',
+                 'rainfall_24h', 'rainfall_7d', 'soil_moisture', 'river_level', 'raw_data')
     timestamp: datetime
     latitude: float
     longitude: float
@@ -35,11 +184,21 @@ class NigeriaWeatherData:
     rainfall_7d: float
     soil_moisture: float
     river_level: float
-    raw_data: Dict[str, Any]
+    raw_data: Optional[Dict[str, Any]]  # Full API response, only kept when requested
+    
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+    
+    def __setstate__(self, state):
+        # copy and pickle restore slots with setattr, which frozen instances reject
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
 
-@dataclass
+@dataclass(frozen=True)
 class WeatherForecast:
     """Weather forecast data"""
+    __slots__ = ('timestamp', 'latitude', 'longitude', 'state_code', 'temperature', 'humidity',
+                 'pressure', 'wind_speed', 'wind_direction', 'precipitation', 'precipitation_probability')
     timestamp: datetime
     latitude: float
     longitude: float
@@ -51,58 +210,60 @@ class WeatherForecast:
     wind_direction: float
     precipitation: float
     precipitation_probability: float
+    
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+    
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
+
+@lru_cache(maxsize=1)
+def _get_http_session() -> requests.Session:
+    """Process-wide HTTP session so every service instance shares one warm connection pool"""
+    session = requests.Session()
+    session.headers.update({
+        'User-Agent': 'Nigeria-SDSS-Flood-Prediction/2.0'
+    })
+    adapter = HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=64,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def create_async_http_session(limit: int = 32, timeout: float = 10) -> aiohttp.ClientSession:
+    """aiohttp session for concurrent Open-Meteo requests; must be created inside a running loop"""
+    return aiohttp.ClientSession(
+        headers={'User-Agent': _get_http_session().headers['User-Agent']},
+        connector=aiohttp.TCPConnector(limit=limit),
+        timeout=aiohttp.ClientTimeout(total=timeout)
+    )
 
 class NigeriaOpenMeteoService:
     """Enhanced Open-Meteo service for Nigeria weather data"""
     
-    def __init__(self):
+    def __init__(self, keep_raw: bool = False):
         self.base_url = "https://api.open-meteo.com/v1"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Nigeria-SDSS-Flood-Prediction/2.0'
-        })
+        self.keep_raw = keep_raw  # Retain full API responses on records (debugging only)
+        self.session = _get_http_session()
+        self._rng = np.random.Generator(np.random.SFC64())  # River level noise
         
-        # Nigeria state coordinates (simplified)
-        self.nigeria_states = {
-            "AB": {"name": "Abia", "lat": 5.5333, "lon": 7.4833, "region": "South East"},
-            "AD": {"name": "Adamawa", "lat": 9.2000, "lon": 12.4833, "region": "North East"},
-            "AK": {"name": "Akwa Ibom", "lat": 5.0333, "lon": 7.9167, "region": "South South"},
-            "AN": {"name": "Anambra", "lat": 6.2107, "lon": 7.0743, "region": "South East"},
-            "BA": {"name": "Bauchi", "lat": 10.3158, "lon": 9.8442, "region": "North East"},
-            "BY": {"name": "Bayelsa", "lat": 4.9167, "lon": 6.2667, "region": "South South"},
-            "BE": {"name": "Benue", "lat": 7.7322, "lon": 8.5391, "region": "North Central"},
-            "BO": {"name": "Borno", "lat": 11.8333, "lon": 13.1500, "region": "North East"},
-            "CR": {"name": "Cross River", "lat": 4.9500, "lon": 8.3167, "region": "South South"},
-            "DE": {"name": "Delta", "lat": 6.2000, "lon": 6.7333, "region": "South South"},
-            "EB": {"name": "Ebonyi", "lat": 6.3333, "lon": 8.1000, "region": "South East"},
-            "ED": {"name": "Edo", "lat": 6.3333, "lon": 5.6167, "region": "South South"},
-            "EK": {"name": "Ekiti", "lat": 7.6167, "lon": 5.2167, "region": "South West"},
-            "EN": {"name": "Enugu", "lat": 6.4500, "lon": 7.5000, "region": "South East"},
-            "FCT": {"name": "Abuja", "lat": 9.0765, "lon": 7.3986, "region": "North Central"},
-            "GO": {"name": "Gombe", "lat": 10.2894, "lon": 11.1717, "region": "North East"},
-            "IM": {"name": "Imo", "lat": 5.4833, "lon": 7.0333, "region": "South East"},
-            "KD": {"name": "Kaduna", "lat": 10.5200, "lon": 7.4383, "region": "North West"},
-            "KN": {"name": "Kano", "lat": 12.0000, "lon": 8.5167, "region": "North West"},
-            "KT": {"name": "Katsina", "lat": 12.9908, "lon": 7.6019, "region": "North West"},
-            "KE": {"name": "Kebbi", "lat": 12.4500, "lon": 4.2000, "region": "North West"},
-            "KO": {"name": "Kogi", "lat": 7.8019, "lon": 6.7446, "region": "North Central"},
-            "KW": {"name": "Kwara", "lat": 8.5000, "lon": 4.5500, "region": "North Central"},
-            "LA": {"name": "Lagos", "lat": 6.5244, "lon": 3.3792, "region": "South West"},
-            "NA": {"name": "Nasarawa", "lat": 8.5000, "lon": 8.2000, "region": "North Central"},
-            "NI": {"name": "Niger", "lat": 9.6000, "lon": 6.5500, "region": "North Central"},
-            "OG": {"name": "Ogun", "lat": 7.1500, "lon": 3.3500, "region": "South West"},
-            "ON": {"name": "Ondo", "lat": 7.2500, "lon": 5.2000, "region": "South West"},
-            "OS": {"name": "Osun", "lat": 7.7667, "lon": 4.5667, "region": "South West"},
-            "OY": {"name": "Oyo", "lat": 7.3833, "lon": 3.9000, "region": "South West"},
-            "PL": {"name": "Plateau", "lat": 9.9167, "lon": 8.9000, "region": "North Central"},
-            "RI": {"name": "Rivers", "lat": 4.7500, "lon": 7.0000, "region": "South South"},
-            "SO": {"name": "Sokoto", "lat": 13.0667, "lon": 5.2333, "region": "North West"},
-            "TA": {"name": "Taraba", "lat": 8.9000, "lon": 11.3667, "region": "North East"},
-            "YO": {"name": "Yobe", "lat": 11.7500, "lon": 11.9667, "region": "North East"},
-            "ZA": {"name": "Zamfara", "lat": 12.1700, "lon": 6.6600, "region": "North West"}
-        }
+        # Open-Meteo refreshes current conditions roughly every 15 minutes
+        self._current_cache = TTLCache(maxsize=64, ttl=600)
+        
+        # Daily forecasts change far more slowly than the endpoints are read
+        self._forecast_cache = TTLCache(maxsize=256, ttl=600)
+        self._cache_lock = threading.RLock()  # Guards both caches
+        
+        # One in-flight async fetch per cache key; locks are dropped once nobody waits on them
+        self._fetch_locks: "weakref.WeakValueDictionary[Tuple, asyncio.Lock]" = weakref.WeakValueDictionary()
+        
+        self.nigeria_states = NIGERIA_STATES
     
-    def get_current_weather_for_state(self, state_code: str) -> NigeriaWeatherData:
+    def get_current_weather_for_state(self, state_code: str, refresh: bool = False) -> NigeriaWeatherData:
         """Get current weather data for a specific Nigeria state"""
         if state_code not in self.nigeria_states:
             raise ValueError(f"Invalid state code: {state_code}")
@@ -112,40 +273,148 @@ class NigeriaOpenMeteoService:
             state_info['lat'], 
             state_info['lon'], 
             state_code, 
-            state_info['region']
+            state_info['region'],
+            refresh
         )
     
     def get_current_weather(self, latitude: float, longitude: float, 
-                          state_code: str = None, region: str = None) -> NigeriaWeatherData:
-        """Get current weather data for a location"""
+                          state_code: str = None, region: str = None,
+                          refresh: bool = False) -> NigeriaWeatherData:
+        """Get current weather data for a location; refresh bypasses (and then updates) the cache"""
+        cache_key = self._current_cache_key(latitude, longitude, state_code, region)
+        if not refresh:
+            with self._cache_lock:
+                cached = self._current_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         url = f"{self.base_url}/forecast"
-        params = {
+        params = self._current_weather_params(latitude, longitude)
+        
+        try:
+            response = self.session.get(url, params=params, timeout=10)
+            response.raise_for_status()
+            weather_data = self._build_weather_data(_loads(response.content), latitude, longitude, state_code, region)
+            with self._cache_lock:
+                self._current_cache[cache_key] = weather_data
+            return weather_data
+            
+        except requests.RequestException as e:
+            logger.error(f"Failed to fetch weather data: {e}")
+            raise
+        except (KeyError, ValueError) as e:
+            logger.error(f"Unexpected API response format: {e}")
+            raise
+    
+    async def get_current_weather_async(self, session: aiohttp.ClientSession, latitude: float,
+                                        longitude: float, state_code: str = None,
+                                        region: str = None, refresh: bool = False) -> NigeriaWeatherData:
+        """Get current weather data for a location over a shared aiohttp session"""
+        return await self._cached_fetch(
+            self._current_cache,
+            self._current_cache_key(latitude, longitude, state_code, region),
+            lambda: self._fetch_current_async(session, latitude, longitude, state_code, region),
+            refresh
+        )
+    
+    async def _fetch_current_async(self, session: aiohttp.ClientSession, latitude: float, longitude: float,
+                                   state_code: str = None, region: str = None) -> NigeriaWeatherData:
+        """Fetch and parse current weather for a location, bypassing the cache"""
+        try:
+            async with session.get(
+                f"{self.base_url}/forecast",
+                params=self._current_weather_params(latitude, longitude)
+            ) as response:
+                response.raise_for_status()
+                data = _loads(await response.read())
+            return self._build_weather_data(data, latitude, longitude, state_code, region)
+            
+        except aiohttp.ClientError as e:
+            logger.error(f"Failed to fetch weather data: {e}")
+            raise
+        except (KeyError, ValueError) as e:
+            logger.error(f"Unexpected API response format: {e}")
+            raise
+    
+    async def _cached_fetch(self, cache: TTLCache, key: Tuple, fetch: Callable[[], Awaitable[Any]],
+                            refresh: bool = False) -> Any:
+        """Read through a TTL cache, letting only one request per key reach Open-Meteo at a time"""
+        if not refresh:
+            with self._cache_lock:
+                cached = cache.get(key)
+            if cached is not None:
+                return cached
+        
+        lock_key = (id(cache), key)
+        lock = self._fetch_locks.get(lock_key)
+        if lock is None:
+            lock = self._fetch_locks[lock_key] = asyncio.Lock()
+        async with lock:
+            # Concurrent misses wait here and then find the result of the first fetch
+            if not refresh:
+                with self._cache_lock:
+                    cached = cache.get(key)
+                if cached is not None:
+                    return cached
+            
+            value = await fetch()
+            with self._cache_lock:
+                cache[key] = value
+            return value
+    
+    async def get_current_weather_for_state_async(self, session: aiohttp.ClientSession, state_code: str,
+                                                  refresh: bool = False) -> NigeriaWeatherData:
+        """Get current weather data for a specific Nigeria state over a shared aiohttp session"""
+        if state_code not in self.nigeria_states:
+            raise ValueError(f"Invalid state code: {state_code}")
+        
+        state_info = self.nigeria_states[state_code]
+        return await self.get_current_weather_async(
+            session,
+            state_info['lat'],
+            state_info['lon'],
+            state_code,
+            state_info['region'],
+            refresh
+        )
+    
+    def _current_cache_key(self, latitude: float, longitude: float,
+                           state_code: str = None, region: str = None) -> Tuple:
+        """Cache key for current conditions at a location (~100m precision)"""
+        return (round(latitude, 3), round(longitude, 3), state_code, region)
+    
+    def _current_weather_params(self, latitude: Any, longitude: Any) -> Dict[str, Any]:
+        """Open-Meteo current conditions query; coordinates may be comma-separated lists"""
+        return {
             'latitude': latitude,
             'longitude': longitude,
-            'current': [
+            'current': ','.join([
                 'temperature_2m',
                 'relative_humidity_2m',
                 'surface_pressure',
                 'wind_speed_10m',
                 'wind_direction_10m',
                 'precipitation'
-            ],
-            'hourly': [
+            ]),
+            'hourly': ','.join([
                 'precipitation',
                 'temperature_2m',
                 'relative_humidity_2m'
-            ],
+            ]),
             'timezone': 'Africa/Lagos'
         }
+    
+    def _build_weather_data(self, data: Dict[str, Any], latitude: float, longitude: float,
+                            state_code: str = None, region: str = None,
+                            hydrology: Tuple[float, float, float, float] = None) -> NigeriaWeatherData:
+        """Build a NigeriaWeatherData record from an Open-Meteo current weather response"""
+        current = data['current']
+        hourly = self._to_hourly_arrays(data['hourly'])
         
-        try:
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            current = data['current']
-            hourly = data['hourly']
-            
+        if hydrology:
+            # Already estimated for many locations at once by _estimate_hydrology_batch
+            rainfall_24h, rainfall_7d, soil_moisture, river_level = hydrology
+        else:
             # Calculate 24h rainfall
             rainfall_24h = self._calculate_24h_rainfall(hourly)
             
@@ -160,32 +429,25 @@ class NigeriaOpenMeteoService:
             )
             
             river_level = self._estimate_river_level(rainfall_7d, state_code)
-            
-            return NigeriaWeatherData(
-                timestamp=datetime.fromisoformat(current['time'].replace('Z', '+00:00')),
-                latitude=latitude,
-                longitude=longitude,
-                state_code=state_code or "UNKNOWN",
-                region=region or "UNKNOWN",
-                temperature=current['temperature_2m'],
-                humidity=current['relative_humidity_2m'],
-                pressure=current['surface_pressure'],
-                wind_speed=current['wind_speed_10m'],
-                wind_direction=current['wind_direction_10m'],
-                precipitation=current['precipitation'],
-                rainfall_24h=rainfall_24h,
-                rainfall_7d=rainfall_7d,
-                soil_moisture=soil_moisture,
-                river_level=river_level,
-                raw_data=data
-            )
-            
-        except requests.RequestException as e:
-            logger.error(f"Failed to fetch weather data: {e}")
-            raise
-        except KeyError as e:
-            logger.error(f"Unexpected API response format: {e}")
-            raise
+        
+        return NigeriaWeatherData(
+            timestamp=_parse_timestamp(current['time']),
+            latitude=latitude,
+            longitude=longitude,
+            state_code=state_code or "UNKNOWN",
+            region=region or "UNKNOWN",
+            temperature=current['temperature_2m'],
+            humidity=current['relative_humidity_2m'],
+            pressure=current['surface_pressure'],
+            wind_speed=current['wind_speed_10m'],
+            wind_direction=current['wind_direction_10m'],
+            precipitation=current['precipitation'],
+            rainfall_24h=rainfall_24h,
+            rainfall_7d=rainfall_7d,
+            soil_moisture=soil_moisture,
+            river_level=river_level,
+            raw_data=data if self.keep_raw else None
+        )
     
     def get_weather_forecast(self, state_code: str, days: int = 7) -> List[WeatherForecast]:
         """Get weather forecast for a Nigeria state"""
@@ -203,11 +465,85 @@ class NigeriaOpenMeteoService:
     def get_forecast(self, latitude: float, longitude: float, 
                     state_code: str = None, days: int = 7) -> List[WeatherForecast]:
         """Get weather forecast for a location"""
+        cache_key = self._forecast_cache_key(latitude, longitude, state_code, days)
+        with self._cache_lock:
+            cached = self._forecast_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         url = f"{self.base_url}/forecast"
-        params = {
+        params = self._forecast_params(latitude, longitude)
+        
+        try:
+            response = self.session.get(url, params=params, timeout=10)
+            response.raise_for_status()
+            forecasts = self._parse_forecast(_loads(response.content), latitude, longitude, state_code, days)
+            with self._cache_lock:
+                self._forecast_cache[cache_key] = forecasts
+            return forecasts
+            
+        except requests.RequestException as e:
+            logger.error(f"Failed to fetch forecast data: {e}")
+            raise
+        except (KeyError, ValueError) as e:
+            logger.error(f"Unexpected API response format: {e}")
+            raise
+    
+    async def get_weather_forecast_async(self, session: aiohttp.ClientSession, state_code: str,
+                                         days: int = 7) -> List[WeatherForecast]:
+        """Get weather forecast for a Nigeria state over a shared aiohttp session"""
+        if state_code not in self.nigeria_states:
+            raise ValueError(f"Invalid state code: {state_code}")
+        
+        state_info = self.nigeria_states[state_code]
+        return await self.get_forecast_async(
+            session,
+            state_info['lat'],
+            state_info['lon'],
+            state_code,
+            days
+        )
+    
+    async def get_forecast_async(self, session: aiohttp.ClientSession, latitude: float,
+                                 longitude: float, state_code: str = None,
+                                 days: int = 7) -> List[WeatherForecast]:
+        """Get weather forecast for a location over a shared aiohttp session"""
+        return await self._cached_fetch(
+            self._forecast_cache,
+            self._forecast_cache_key(latitude, longitude, state_code, days),
+            lambda: self._fetch_forecast_async(session, latitude, longitude, state_code, days)
+        )
+    
+    async def _fetch_forecast_async(self, session: aiohttp.ClientSession, latitude: float, longitude: float,
+                                    state_code: str = None, days: int = 7) -> List[WeatherForecast]:
+        """Fetch and parse a daily forecast for a location, bypassing the cache"""
+        try:
+            async with session.get(
+                f"{self.base_url}/forecast",
+                params=self._forecast_params(latitude, longitude)
+            ) as response:
+                response.raise_for_status()
+                data = _loads(await response.read())
+            return self._parse_forecast(data, latitude, longitude, state_code, days)
+            
+        except aiohttp.ClientError as e:
+            logger.error(f"Failed to fetch forecast data: {e}")
+            raise
+        except (KeyError, ValueError) as e:
+            logger.error(f"Unexpected API response format: {e}")
+            raise
+    
+    def _forecast_cache_key(self, latitude: float, longitude: float,
+                            state_code: str = None, days: int = 7) -> Tuple:
+        """Cache key for a location's daily forecast (~100m precision)"""
+        return (round(latitude, 3), round(longitude, 3), state_code, days)
+    
+    def _forecast_params(self, latitude: float, longitude: float) -> Dict[str, Any]:
+        """Open-Meteo daily forecast query"""
+        return {
             'latitude': latitude,
             'longitude': longitude,
-            'daily': [
+            'daily': ','.join([
                 'temperature_2m_max',
                 'temperature_2m_min',
                 'relative_humidity_2m_mean',
@@ -216,109 +552,189 @@ class NigeriaOpenMeteoService:
                 'wind_direction_10m_dominant',
                 'precipitation_sum',
                 'precipitation_probability_max'
-            ],
+            ]),
             'timezone': 'Africa/Lagos'
         }
+    
+    def _parse_forecast(self, data: Dict[str, Any], latitude: float, longitude: float,
+                        state_code: str = None, days: int = 7) -> List[WeatherForecast]:
+        """Build WeatherForecast records from an Open-Meteo daily forecast response"""
+        daily = data['daily']
+        forecasts = []
+        
+        for i, date_str in enumerate(daily['time'][:days]):
+            forecasts.append(WeatherForecast(
+                timestamp=_parse_timestamp(date_str),
+                latitude=latitude,
+                longitude=longitude,
+                state_code=state_code or "UNKNOWN",
+                temperature=(daily['temperature_2m_max'][i] + daily['temperature_2m_min'][i]) / 2,
+                humidity=daily['relative_humidity_2m_mean'][i],
+                pressure=daily['surface_pressure_mean'][i],
+                wind_speed=daily['wind_speed_10m_max'][i],
+                wind_direction=daily['wind_direction_10m_dominant'][i],
+                precipitation=daily['precipitation_sum'][i],
+                precipitation_probability=daily['precipitation_probability_max'][i]
+            ))
+        
+        return forecasts
+    
+    def get_all_states_weather(self) -> Dict[str, NigeriaWeatherData]:
+        """Get current weather data for all Nigeria states in one multi-location request"""
+        url = f"{self.base_url}/forecast"
         
         try:
-            response = self.session.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=self._all_states_params(), timeout=30)
             response.raise_for_status()
-            data = response.json()
-            
-            daily = data['daily']
-            forecasts = []
-            
-            for i, date_str in enumerate(daily['time'][:days]):
-                forecasts.append(WeatherForecast(
-                    timestamp=datetime.fromisoformat(date_str),
-                    latitude=latitude,
-                    longitude=longitude,
-                    state_code=state_code or "UNKNOWN",
-                    temperature=(daily['temperature_2m_max'][i] + daily['temperature_2m_min'][i]) / 2,
-                    humidity=daily['relative_humidity_2m_mean'][i],
-                    pressure=daily['surface_pressure_mean'][i],
-                    wind_speed=daily['wind_speed_10m_max'][i],
-                    wind_direction=daily['wind_direction_10m_dominant'][i],
-                    precipitation=daily['precipitation_sum'][i],
-                    precipitation_probability=daily['precipitation_probability_max'][i]
-                ))
-            
-            return forecasts
-            
-        except requests.RequestException as e:
-            logger.error(f"Failed to fetch forecast data: {e}")
-            raise
-        except KeyError as e:
-            logger.error(f"Unexpected API response format: {e}")
-            raise
+            locations = _loads(response.content)
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"Batched weather request failed, fetching states individually: {e}")
+            return asyncio.run(self.get_all_states_weather_async())
+        
+        return self._parse_all_states(locations)
     
-    def get_all_states_weather(self) -> Dict[str, NigeriaWeatherData]:
-        """Get current weather data for all Nigeria states"""
+    async def get_all_states_weather_batched_async(self, session: aiohttp.ClientSession) -> Dict[str, NigeriaWeatherData]:
+        """get_all_states_weather over a shared aiohttp session, without blocking the event loop"""
+        try:
+            async with session.get(
+                f"{self.base_url}/forecast",
+                params=self._all_states_params(),
+                timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                response.raise_for_status()
+                locations = _loads(await response.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.error(f"Batched weather request failed, fetching states individually: {e}")
+            return await self.get_all_states_weather_async(session=session)
+        
+        return self._parse_all_states(locations)
+    
+    def _all_states_params(self) -> Dict[str, Any]:
+        """Current conditions query for every state's coordinates at once"""
+        return self._current_weather_params(
+            ','.join(map(str, STATE_LATS.tolist())), ','.join(map(str, STATE_LONS.tolist()))
+        )
+    
+    def _parse_all_states(self, locations: Any) -> Dict[str, NigeriaWeatherData]:
+        """Build per-state records from a multi-location response, warming the per-state cache"""
+        # Open-Meteo returns one response object per coordinate, in request order
+        if isinstance(locations, dict):
+            locations = [locations]
+        
+        # Derived hydrology for every state in one vectorized pass
+        states = list(zip(self.nigeria_states.items(), locations))
+        try:
+            hydrology = self._estimate_hydrology_batch(
+                [self._to_hourly_arrays(data['hourly']) for _, data in states],
+                np.array([data['current']['temperature_2m'] for _, data in states], dtype=np.float64),
+                np.array([data['current']['relative_humidity_2m'] for _, data in states], dtype=np.float64),
+                np.arange(len(states))
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Unexpected batched API response format, parsing states individually: {e}")
+            hydrology = [None] * len(states)
+        
         all_weather = {}
+        for ((state_code, state_info), data), state_hydrology in zip(states, hydrology):
+            try:
+                all_weather[state_code] = self._build_weather_data(
+                    data, state_info['lat'], state_info['lon'], state_code, state_info['region'],
+                    hydrology=state_hydrology
+                )
+                # Warm the per-state cache used by get_current_weather_for_state
+                cache_key = self._current_cache_key(
+                    state_info['lat'], state_info['lon'], state_code, state_info['region']
+                )
+                with self._cache_lock:
+                    self._current_cache[cache_key] = all_weather[state_code]
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error(f"Failed to parse weather for {state_code}: {e}")
         
-        for state_code, state_info in self.nigeria_states.items():
+        logger.info(f"Fetched weather for {len(all_weather)} states in one request")
+        return all_weather
+    
+    async def get_all_states_weather_async(self, max_concurrency: int = 10,
+                                           session: aiohttp.ClientSession = None) -> Dict[str, NigeriaWeatherData]:
+        """Get current weather data for all Nigeria states with concurrent requests"""
+        if session is None:
+            async with create_async_http_session() as session:
+                return await self.get_all_states_weather_async(max_concurrency, session)
+        
+        # The semaphore replaces the old per-request sleep as the rate limit
+        semaphore = asyncio.Semaphore(max_concurrency)
+        results = await asyncio.gather(*[
+            self._fetch_current(session, semaphore, state_code, state_info)
+            for state_code, state_info in self.nigeria_states.items()
+        ])
+        
+        return {
+            state_code: weather_data
+            for state_code, weather_data in zip(self.nigeria_states, results)
+            if weather_data is not None
+        }
+    
+    async def _fetch_current(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                             state_code: str, state_info: Dict[str, Any]) -> Optional[NigeriaWeatherData]:
+        """Fetch current weather for one state, returning None if the request fails"""
+        async with semaphore:
             try:
-                weather_data = self.get_current_weather(
-                    state_info['lat'], 
-                    state_info['lon'], 
-                    state_code, 
-                    state_info['region']
+                weather_data = await self.get_current_weather_async(
+                    session, state_info['lat'], state_info['lon'], state_code, state_info['region']
                 )
-                all_weather[state_code] = weather_data
                 logger.info(f"Fetched weather for {state_info['name']} ({state_code})")
-                
-                # Add small delay to avoid rate limiting
-                import time
-                time.sleep(0.1)
+                return weather_data
                 
             except Exception as e:
                 logger.error(f"Failed to fetch weather for {state_code}: {e}")
-                continue
-        
-        return all_weather
+                return None
     
-    def _calculate_24h_rainfall(self, hourly_data: Dict[str, List]) -> float:
+    def _to_hourly_arrays(self, hourly_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert numeric hourly series to float arrays in place (missing values become NaN)"""
+        for key, values in hourly_data.items():
+            if key != 'time':
+                hourly_data[key] = np.asarray(values, dtype=np.float64)
+        return hourly_data
+    
+    def _calculate_24h_rainfall(self, hourly_data: Dict[str, Any]) -> float:
         """Calculate 24-hour rainfall from hourly data"""
         try:
-            precipitation = hourly_data.get('precipitation', [])
-            if len(precipitation) >= 24:
-                return sum(precipitation[:24])
-            else:
-                return sum(precipitation) if precipitation else 0.0
-        except Exception:
+            precipitation = np.asarray(hourly_data.get('precipitation', []), dtype=np.float64)
+            return float(np.nansum(precipitation[:24]))
+        except (TypeError, ValueError):
             return 0.0
     
     def _estimate_soil_moisture(self, temperature: float, rainfall_24h: float, humidity: float) -> float:
         """Estimate soil moisture based on weather conditions"""
-        # Simple model: higher rainfall and humidity = higher soil moisture
-        # Higher temperature = more evaporation = lower soil moisture
-        base_moisture = 0.3
-        rainfall_factor = min(0.4, rainfall_24h / 50)  # Max 0.4 from rainfall
-        humidity_factor = (humidity - 50) / 100 * 0.2  # Humidity contribution
-        temperature_factor = max(0, (30 - temperature) / 20 * 0.1)  # Temperature effect
-        
-        soil_moisture = base_moisture + rainfall_factor + humidity_factor + temperature_factor
-        return max(0.0, min(1.0, soil_moisture))
+        return float(_soil_moisture_kernel(temperature, rainfall_24h, humidity))
     
     def _estimate_river_level(self, rainfall_7d: float, state_code: str = None) -> float:
         """Estimate river level based on rainfall and state characteristics"""
-        base_level = 2.0
-        
         # State-specific flood risk factors
-        flood_risk_factors = {
-            'AN': 2.0, 'BY': 2.0, 'DE': 2.0, 'RI': 2.0, 'LA': 2.0,  # Critical risk states
-            'AB': 1.5, 'AK': 1.5, 'CR': 1.5, 'EB': 1.5, 'ED': 1.5, 'IM': 1.5, 'OG': 1.5,  # High risk states
-            'BE': 1.5, 'TA': 1.5, 'AD': 1.5,  # High risk states
-            'FCT': 1.0, 'BA': 1.0, 'GO': 1.0, 'KD': 1.0, 'KW': 1.0, 'NA': 1.0, 'NI': 1.0,  # Medium risk states
-            'EK': 1.0, 'EN': 1.0, 'ON': 1.0, 'OS': 1.0, 'OY': 1.0, 'KE': 1.0,  # Medium risk states
-            'BO': 0.5, 'YO': 0.5, 'KN': 0.5, 'KT': 0.5, 'SO': 0.5, 'ZA': 0.5, 'PL': 0.5  # Low risk states
-        }
-        
-        risk_factor = flood_risk_factors.get(state_code, 1.0)
+        risk_factor = FLOOD_RISK_FACTORS.get(state_code, 1.0)
         
         # Calculate river level
-        river_level = base_level + (rainfall_7d * 0.1 * risk_factor) + np.random.normal(0, 0.2)
-        return max(1.0, river_level)
+        return float(_river_level_kernel(rainfall_7d, risk_factor, self._rng.standard_normal() * 0.2))
+    
+    def _estimate_hydrology_batch(self, hourlies: List[Dict[str, List]], temperature: np.ndarray,
+                                  humidity: np.ndarray, state_idx: np.ndarray) -> List[Tuple[float, float, float, float]]:
+        """Vectorized rainfall, soil moisture and river level estimates for many locations"""
+        # First 24 hourly precipitation values per location (short series are zero-padded)
+        precipitation = np.zeros((len(hourlies), 24), dtype=np.float64)
+        for i, hourly in enumerate(hourlies):
+            values = hourly.get('precipitation')
+            if values is not None:
+                values = values[:24]
+                precipitation[i, :len(values)] = values
+        
+        rainfall_24h = np.nansum(precipitation, axis=1)
+        rainfall_7d = rainfall_24h * 1.5  # Rough estimate, as in get_current_weather
+        
+        soil_moisture = _soil_moisture_kernel(temperature, rainfall_24h, humidity)
+        river_level = _river_level_kernel(
+            rainfall_7d, STATE_RISK_FACTORS[state_idx], self._rng.standard_normal(len(state_idx)) * 0.2
+        )
+        
+        return list(zip(rainfall_24h.tolist(), rainfall_7d.tolist(), soil_moisture.tolist(), river_level.tolist()))
 
 class NigeriaWeatherDataIngestion:
     """Enhanced weather data ingestion service for Nigeria"""
@@ -344,15 +760,35 @@ class NigeriaWeatherDataIngestion:
             'wind_speed': 'WIND',
             'precipitation': 'RAIN'
         }
+        
+        # Sensor IDs by (state_code, lat, lon), filled by _ensure_weather_sensors_exist
+        self._sensor_cache: Dict[Tuple[str, float, float], Dict[str, str]] = {}
+        
+        # Cleared if the training_weather_by_location database function is missing
+        self._training_rpc_available = True
     
     def ingest_all_states_weather(self) -> Dict[str, NigeriaWeatherData]:
         """Ingest current weather data for all Nigeria states"""
         try:
             all_weather = self.weather_service.get_all_states_weather()
             
-            # Store data in database
-            for state_code, weather_data in all_weather.items():
-                self._store_weather_data(weather_data)
+            # Store every state's readings with a single bulk insert
+            self._store_weather_batch(list(all_weather.values()))
+            
+            logger.info(f"Successfully ingested weather data for {len(all_weather)} states")
+            return all_weather
+            
+        except Exception as e:
+            logger.error(f"Failed to ingest all states weather: {e}")
+            raise
+    
+    async def ingest_all_states_weather_async(self, session: aiohttp.ClientSession) -> Dict[str, NigeriaWeatherData]:
+        """Ingest current weather for all Nigeria states, fetching over a shared aiohttp session"""
+        try:
+            all_weather = await self.weather_service.get_all_states_weather_batched_async(session)
+            
+            # Store every state's readings with a single bulk insert, off the event loop
+            await asyncio.to_thread(self._store_weather_batch, list(all_weather.values()))
             
             logger.info(f"Successfully ingested weather data for {len(all_weather)} states")
             return all_weather
@@ -364,7 +800,8 @@ class NigeriaWeatherDataIngestion:
     def ingest_state_weather(self, state_code: str) -> NigeriaWeatherData:
         """Ingest current weather data for a specific state"""
         try:
-            weather_data = self.weather_service.get_current_weather_for_state(state_code)
+            # Ingestion always records fresh conditions, which also refreshes the read cache
+            weather_data = self.weather_service.get_current_weather_for_state(state_code, refresh=True)
             self._store_weather_data(weather_data)
             
             logger.info(f"Successfully ingested weather for {state_code}")
@@ -374,63 +811,104 @@ class NigeriaWeatherDataIngestion:
             logger.error(f"Failed to ingest weather for {state_code}: {e}")
             raise
     
+    async def ingest_state_weather_async(self, session: aiohttp.ClientSession,
+                                         state_code: str) -> NigeriaWeatherData:
+        """Ingest current weather for a state, fetching over a shared aiohttp session"""
+        try:
+            weather_data = await self.weather_service.get_current_weather_for_state_async(
+                session, state_code, refresh=True
+            )
+            
+            # The Supabase client is synchronous, so store off the event loop
+            await asyncio.to_thread(self._store_weather_data, weather_data)
+            
+            logger.info(f"Successfully ingested weather for {state_code}")
+            return weather_data
+            
+        except Exception as e:
+            logger.error(f"Failed to ingest weather for {state_code}: {e}")
+            raise
+    
     def _store_weather_data(self, weather_data: NigeriaWeatherData):
         """Store weather data in the database"""
+        self._store_weather_batch([weather_data])
+    
+    def _store_weather_batch(self, weather_batch: List[NigeriaWeatherData]):
+        """Store weather data for one or more locations with a single insert"""
         if not self.supabase:
             logger.warning("Database not available, skipping data storage")
             return
         
+        readings = []
+        for weather_data in weather_batch:
+            try:
+                # Ensure sensors exist for this location
+                sensor_ids = self._ensure_weather_sensors_exist(
+                    weather_data.latitude, 
+                    weather_data.longitude, 
+                    weather_data.state_code
+                )
+                readings.extend(self._build_readings(weather_data, sensor_ids))
+            except Exception as e:
+                logger.error(f"Error preparing weather readings for {weather_data.state_code}: {e}")
+        
+        if not readings:
+            return
+        
+        label = weather_batch[0].state_code if len(weather_batch) == 1 else f"{len(weather_batch)} states"
         try:
-            # Ensure sensors exist for this location
-            sensor_ids = self._ensure_weather_sensors_exist(
-                weather_data.latitude, 
-                weather_data.longitude, 
-                weather_data.state_code
-            )
-            
-            readings = []
-            
-            # Map weather data to sensor readings
-            sensor_mappings = {
-                'temperature': weather_data.temperature,
-                'humidity': weather_data.humidity,
-                'pressure': weather_data.pressure,
-                'wind_speed': weather_data.wind_speed,
-                'precipitation': weather_data.precipitation
-            }
-            
-            for sensor_name, value in sensor_mappings.items():
-                if sensor_name in sensor_ids and value is not None:
-                    reading = {
-                        'sensor_id': sensor_ids[sensor_name],
-                        'ts': weather_data.timestamp.isoformat(),
-                        'value': float(value),
-                        'status': 'OK',
-                        'lat': weather_data.latitude,
-                        'lon': weather_data.longitude,
-                        'raw': json.dumps({
-                            'source': 'open-meteo-nigeria',
-                            'state_code': weather_data.state_code,
-                            'region': weather_data.region,
-                            'rainfall_24h': weather_data.rainfall_24h,
-                            'rainfall_7d': weather_data.rainfall_7d,
-                            'soil_moisture': weather_data.soil_moisture,
-                            'river_level': weather_data.river_level,
-                            'timestamp': weather_data.timestamp.isoformat()
-                        })
-                    }
-                    readings.append(reading)
-            
-            # Insert all readings
-            if readings:
-                result = self.supabase.table('sensor_readings').insert(readings).execute()
+            # Upsert readings in bounded batches; repeated (sensor_id, ts) rows are merged
+            for start in range(0, len(readings), INSERT_BATCH_SIZE):
+                batch = readings[start:start + INSERT_BATCH_SIZE]
+                result = self.supabase.table('sensor_readings').upsert(batch, on_conflict='sensor_id,ts').execute()
                 if result.data:
-                    logger.info(f"Stored {len(readings)} weather readings for {weather_data.state_code}")
+                    logger.info(f"Stored {len(batch)} weather readings for {label}")
                 else:
-                    logger.error(f"Failed to store weather readings for {weather_data.state_code}")
+                    logger.error(f"Failed to store weather readings for {label}")
         
         except Exception as e:
-            logger.error(f"Error storing weather data for {weather_data.state_code}: {e}")
+            logger.error(f"Error storing weather data for {label}: {e}")
+    
+    def _build_readings(self, weather_data: NigeriaWeatherData, sensor_ids: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Map weather data onto sensor_readings rows for the given sensors"""
+        readings = []
+        
+        # The raw payload is the same for every sensor at this location, so serialize it once
+        timestamp = weather_data.timestamp.isoformat()
+        raw_payload = _dumps({
+            'source': 'open-meteo-nigeria',
+            'state_code': weather_data.state_code,
+            'region': weather_data.region,
+            'rainfall_24h': weather_data.rainfall_24h,
+            'rainfall_7d': weather_data.rainfall_7d,
+            'soil_moisture': weather_data.soil_moisture,
+            'river_level': weather_data.river_level,
+            'timestamp': timestamp
+        })
+        
+        # Map weather data to sensor readings
+        sensor_mappings = {
+            'temperature': weather_data.temperature,
+            'humidity': weather_data.humidity,
+            'pressure': weather_data.pressure,
+            'wind_speed': weather_data.wind_speed,
+            'precipitation': weather_data.precipitation
+        }
+        
+        for sensor_name, value in sensor_mappings.items():
+            if sensor_name in sensor_ids and value is not None:
+                reading = {
+                    'sensor_id': sensor_ids[sensor_name],
+                    'ts': timestamp,
+                    'value': float(value),
+                    'status': 'OK',
+                    'lat': weather_data.latitude,
+                    'lon': weather_data.longitude,
+                    'raw': raw_payload
+                }
+                readings.append(reading)
+        
+        return readings
     
     def _ensure_weather_sensors_exist(self, latitude: float, longitude: float, 
                                     state_code: str) -> Dict[str, str]:
@@ -439,14 +917,25 @@ class NigeriaWeatherDataIngestion:
             logger.warning("Database not available, returning empty sensor IDs")
             return {}
         
+        # Sensors are never deleted, so a complete set found once stays valid
+        cache_key = (state_code, latitude, longitude)
+        cached = self._sensor_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+        
+        # Look up every existing sensor type at this location in one query
+        result = self.supabase.table('sensors').select('id,type').in_(
+            'type', list(self.weather_sensor_types.values())
+        ).eq('lat', latitude).eq('lon', longitude).execute()
+        existing = {}
+        for row in result.data or []:
+            existing.setdefault(row['type'], row['id'])
+        
         sensor_ids = {}
         
         for sensor_name, sensor_type in self.weather_sensor_types.items():
-            # Check if sensor already exists
-            result = self.supabase.table('sensors').select('id').eq('type', sensor_type).eq('lat', latitude).eq('lon', longitude).execute()
-            
-            if result.data:
-                sensor_ids[sensor_name] = result.data[0]['id']
+            if sensor_type in existing:
+                sensor_ids[sensor_name] = existing[sensor_type]
             else:
                 # Create new sensor
                 sensor_data = {
@@ -462,11 +951,21 @@ class NigeriaWeatherDataIngestion:
                     sensor_ids[sensor_name] = result.data[0]['id']
                     logger.info(f"Created new {sensor_name} sensor for {state_code}: {sensor_ids[sensor_name]}")
         
+        # Only cache complete sets so a failed sensor creation is retried next time
+        if len(sensor_ids) == len(self.weather_sensor_types):
+            self._sensor_cache[cache_key] = dict(sensor_ids)
+        
         return sensor_ids
     
     def get_weather_data_for_training(self, state_codes: List[str] = None, 
                                     days_back: int = 30) -> List[Dict[str, Any]]:
         """Get weather data from database for ML model training"""
+        return asyncio.run(self.get_weather_data_for_training_async(state_codes, days_back))
+    
+    async def get_weather_data_for_training_async(self, state_codes: List[str] = None,
+                                                  days_back: int = 30,
+                                                  max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """Get training data for many states concurrently, at most max_concurrency at a time"""
         if not self.supabase:
             logger.warning("Database not available, returning empty training data")
             return []
@@ -480,81 +979,13 @@ class NigeriaWeatherDataIngestion:
             if state_codes is None:
                 state_codes = list(self.weather_service.nigeria_states.keys())
             
-            all_training_data = []
-            
-            for state_code in state_codes:
-                state_info = self.weather_service.nigeria_states[state_code]
-                
-                # Get sensor IDs for this state
-                sensor_ids = {}
-                for sensor_type in self.weather_sensor_types.values():
-                    result = self.supabase.table('sensors').select('id').eq('type', sensor_type).eq('lat', state_info['lat']).eq('lon', state_info['lon']).execute()
-                    if result.data:
-                        sensor_ids[sensor_type] = result.data[0]['id']
-                
-                if not sensor_ids:
-                    logger.warning(f"No weather sensors found for {state_code}")
-                    continue
-                
-                # Get readings for all sensors
-                all_readings = []
-                for sensor_type, sensor_id in sensor_ids.items():
-                    result = self.supabase.table('sensor_readings').select('*').eq('sensor_id', sensor_id).gte('ts', start_date.isoformat()).lte('ts', end_date.isoformat()).order('ts').execute()
-                    
-                    if result.data:
-                        all_readings.extend(result.data)
-                
-                # Group readings by timestamp
-                grouped_data = {}
-                for reading in all_readings:
-                    ts = reading['ts']
-                    if ts not in grouped_data:
-                        grouped_data[ts] = {
-                            'timestamp': ts,
-                            'state_code': state_code,
-                            'region': state_info['region'],
-                            'latitude': state_info['lat'],
-                            'longitude': state_info['lon']
-                        }
-                    
-                    # Map sensor type to reading value
-                    sensor_type = None
-                    for stype, sid in sensor_ids.items():
-                        if sid == reading['sensor_id']:
-                            sensor_type = stype
-                            break
-                    
-                    if sensor_type:
-                        # Map to weather parameter names
-                        if sensor_type == 'TEMP':
-                            grouped_data[ts]['temperature'] = reading['value']
-                        elif sensor_type == 'HUMIDITY':
-                            grouped_data[ts]['humidity'] = reading['value']
-                        elif sensor_type == 'PRESSURE':
-                            grouped_data[ts]['pressure'] = reading['value']
-                        elif sensor_type == 'WIND':
-                            grouped_data[ts]['wind_speed'] = reading['value']
-                        elif sensor_type == 'RAIN':
-                            grouped_data[ts]['precipitation'] = reading['value']
-                        
-                        # Extract additional data from raw field
-                        if reading.get('raw'):
-                            try:
-                                raw_data = json.loads(reading['raw'])
-                                if 'rainfall_24h' in raw_data:
-                                    grouped_data[ts]['rainfall_24h'] = raw_data['rainfall_24h']
-                                if 'rainfall_7d' in raw_data:
-                                    grouped_data[ts]['rainfall_7d'] = raw_data['rainfall_7d']
-                                if 'soil_moisture' in raw_data:
-                                    grouped_data[ts]['soil_moisture'] = raw_data['soil_moisture']
-                                if 'river_level' in raw_data:
-                                    grouped_data[ts]['river_level'] = raw_data['river_level']
-                            except json.JSONDecodeError:
-                                pass
-                
-                # Convert to list and add to training data
-                state_training_data = list(grouped_data.values())
-                all_training_data.extend(state_training_data)
+            # Query every state at once instead of one round trip after another
+            semaphore = asyncio.Semaphore(max_concurrency)
+            state_records = await asyncio.gather(*[
+                self._fetch_state_training(semaphore, state_code, start_date, end_date)
+                for state_code in state_codes
+            ])
+            all_training_data = [record for records in state_records for record in records]
             
             # Sort by timestamp
             all_training_data.sort(key=lambda x: x['timestamp'])
@@ -565,6 +996,101 @@ class NigeriaWeatherDataIngestion:
         except Exception as e:
             logger.error(f"Failed to get weather data for training: {e}")
             return []
+    
+    async def _fetch_state_training(self, semaphore: asyncio.Semaphore, state_code: str,
+                                    start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
+        """Fetch one state's training records without blocking the other states' queries"""
+        async with semaphore:
+            # The Supabase client is synchronous, so run each state's queries in a worker thread
+            return await asyncio.to_thread(self._state_training_data, state_code, start_date, end_date)
+    
+    def _state_training_data(self, state_code: str, start_date: datetime,
+                             end_date: datetime) -> List[Dict[str, Any]]:
+        """Load and group one state's sensor readings into training records"""
+        state_info = self.weather_service.nigeria_states[state_code]
+        
+        # Let Postgres pivot the readings when training_weather_by_location is deployed
+        if self._training_rpc_available:
+            try:
+                result = self.supabase.rpc('training_weather_by_location', {
+                    'p_lat': state_info['lat'],
+                    'p_lon': state_info['lon'],
+                    'p_from': start_date.isoformat(),
+                    'p_to': end_date.isoformat()
+                }).execute()
+                return self._rpc_training_records(result.data or [], state_code, state_info)
+            except Exception as e:
+                # Only a missing function disables the RPC; other failures fall back for this call
+                if isinstance(e, APIError) and str(e.code) in MISSING_RPC_ERROR_CODES:
+                    logger.warning(f"training_weather_by_location unavailable, grouping readings in Python: {e}")
+                    self._training_rpc_available = False
+                else:
+                    logger.warning(f"training_weather_by_location failed, grouping readings in Python: {e}")
+        
+        # Get sensor IDs for this state
+        sensor_ids = {}
+        for sensor_type in self.weather_sensor_types.values():
+            result = self.supabase.table('sensors').select('id').eq('type', sensor_type).eq('lat', state_info['lat']).eq('lon', state_info['lon']).execute()
+            if result.data:
+                sensor_ids[sensor_type] = result.data[0]['id']
+        
+        if not sensor_ids:
+            logger.warning(f"No weather sensors found for {state_code}")
+            return []
+        
+        # Get readings for all of the state's sensors in one query
+        result = self.supabase.table('sensor_readings').select('sensor_id,ts,value,raw').in_('sensor_id', list(sensor_ids.values())).gte('ts', start_date.isoformat()).lte('ts', end_date.isoformat()).order('ts').execute()
+        
+        # Group readings by timestamp into training records
+        return self._group_readings(result.data or [], sensor_ids, state_code, state_info)
+
+    def _rpc_training_records(self, rows: List[Dict[str, Any]], state_code: str,
+                              state_info: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Shape pivoted rows from training_weather_by_location like _group_readings output"""
+        records = []
+        for row in rows:
+            record = {
+                'timestamp': row['ts'],
+                'state_code': state_code,
+                'region': state_info['region'],
+                'latitude': state_info['lat'],
+                'longitude': state_info['lon']
+            }
+            record.update((key, value) for key, value in row.items() if key != 'ts' and value is not None)
+            records.append(record)
+        return records
+    
+    def _group_readings(self, readings: List[Dict[str, Any]], sensor_ids: Dict[str, str],
+                        state_code: str, state_info: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Pivot a state's sensor readings into one training record per timestamp"""
+        if not readings:
+            return []
+        
+        df = pd.DataFrame(readings, columns=['sensor_id', 'ts', 'value', 'raw'])
+        df['column'] = df['sensor_id'].map({sid: SENSOR_TYPE_COLUMNS[stype] for stype, sid in sensor_ids.items()})
+        df = df[df['column'].notna()]
+        if df.empty:
+            return []
+        
+        # Sensor values by timestamp; a later reading for the same sensor and time wins
+        values = df.groupby(['ts', 'column'], sort=False)['value'].last().unstack()
+        
+        # Derived hydrology values from the raw payloads; the last reading carrying a field wins
+        raw_fields = pd.DataFrame(df['raw'].map(_parse_raw).tolist(), columns=RAW_TRAINING_FIELDS)
+        raw_fields['ts'] = df['ts'].to_numpy()
+        grouped = values.join(raw_fields.groupby('ts', sort=False).last())
+        
+        grouped = grouped.rename_axis('timestamp').reset_index()
+        grouped['state_code'] = state_code
+        grouped['region'] = state_info['region']
+        grouped['latitude'] = state_info['lat']
+        grouped['longitude'] = state_info['lon']
+        
+        # Keep the record contract: fields without a reading are left out
+        return [
+            {key: value for key, value in record.items() if not pd.isna(value)}
+            for record in grouped.to_dict(orient='records')
+        ]
 
 # Global instances
 nigeria_weather_service = NigeriaOpenMeteoService()
@@ -579,6 +1105,15 @@ def get_nigeria_weather_forecast(state_code: str, days: int = 7) -> List[Weather
     """Get weather forecast for a Nigeria state"""
     return nigeria_weather_service.get_weather_forecast(state_code, days)
 
+async def get_nigeria_state_weather_async(session: aiohttp.ClientSession, state_code: str) -> NigeriaWeatherData:
+    """Get current weather data for a specific Nigeria state over a shared aiohttp session"""
+    return await nigeria_weather_service.get_current_weather_for_state_async(session, state_code)
+
+async def get_nigeria_weather_forecast_async(session: aiohttp.ClientSession, state_code: str,
+                                             days: int = 7) -> List[WeatherForecast]:
+    """Get weather forecast for a Nigeria state over a shared aiohttp session"""
+    return await nigeria_weather_service.get_weather_forecast_async(session, state_code, days)
+
 def ingest_nigeria_weather_data(state_code: str = None) -> Dict[str, NigeriaWeatherData]:
     """Ingest weather data for Nigeria states"""
     if state_code:
@@ -589,3 +1124,7 @@ def ingest_nigeria_weather_data(state_code: str = None) -> Dict[str, NigeriaWeat
 def get_nigeria_weather_training_data(state_codes: List[str] = None, days_back: int = 30):
     """Get weather data for ML model training"""
     return nigeria_weather_ingestion.get_weather_data_for_training(state_codes, days_back)
+
+async def get_nigeria_weather_training_data_async(state_codes: List[str] = None, days_back: int = 30):
+    """Get weather data for ML model training without blocking the event loop"""
+    return await nigeria_weather_ingestion.get_weather_data_for_training_async(state_codes, days_back)
@@ -3,22 +3,89 @@ Open-Meteo Weather Data Integration Service
 Fetches real weather data and stores it in the database for ML model training
 """
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import aiohttp
 import json
 import asyncio
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Any, Optional, Tuple, Union
 import logging
 from dataclasses import dataclass
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import hashlib
 import os
+import time
 from supabase import create_client, Client
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
+import pandas as pd
+
+try:
+    import orjson
+    
+    def _dumps(obj: Any) -> str:
+        """Serialize to a compact JSON string with the native orjson encoder"""
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    
+    _loads = orjson.loads
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    def _dumps(obj: Any) -> str:
+        """Serialize to a JSON string"""
+        return json.dumps(obj)
+    
+    _loads = json.loads
+
+try:
+    import lz4.frame as _cache_codec
+    RESPONSE_CACHE_SUFFIX = '.json.lz4'
+except ImportError:  # lz4 is optional; cached responses are gzipped without it
+    import gzip as _cache_codec
+    RESPONSE_CACHE_SUFFIX = '.json.gz'
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Days per historical request and concurrent fetches when backfilling one location
+HISTORICAL_CHUNK_DAYS = 90
+HISTORICAL_FETCH_WORKERS = 4
+
+# Seconds allowed for a historical response; multi-year ranges run to several MB
+HISTORICAL_TIMEOUT = 30
+
+# On-disk cache of Open-Meteo responses, shared by the cron job, pipeline runs and the API
+RESPONSE_CACHE_DIR = os.path.expanduser(os.getenv('WEATHER_CACHE_DIR', '~/.cache/sdss/weather'))
+
+# Seconds before a cached historical range reaching today is refetched (past ranges never expire)
+HISTORICAL_CACHE_TTL = 3600
+
+# Open-Meteo refreshes current conditions roughly every 15 minutes
+CURRENT_CACHE_TTL = 600
+
+# Training data column for each weather sensor type
+SENSOR_TYPE_COLUMNS = {
+    'TEMP': 'temperature',
+    'HUMIDITY': 'humidity',
+    'PRESSURE': 'pressure',
+    'WIND': 'wind_speed',
+    'RAIN': 'precipitation'
+}
+
+# PostgREST error codes meaning training_weather_by_location is not deployed
+MISSING_RPC_ERROR_CODES = ('PGRST202', '404')
+
+# Maximum rows per sensor_readings upsert request
+INSERT_BATCH_SIZE = 10_000
+
+@dataclass(frozen=True)
 class WeatherData:
     """Weather data structure"""
+    # Explicit __slots__ (dataclass slots=True needs Python 3.10) keep instances small
+    __slots__ = ('timestamp', 'temperature', 'humidity', 'pressure', 'wind_speed',
+                 'wind_direction', 'precipitation', 'latitude', 'longitude', 'raw_bytes')
     timestamp: datetime
     temperature: float
     humidity: float
@@ -28,112 +95,360 @@ class WeatherData:
     precipitation: float
     latitude: float
     longitude: float
-    raw_data: Dict[str, Any]
+    raw_bytes: bytes  # Original API response body, shared by every row it produced
+    
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+    
+    def __setstate__(self, state):
+        # copy and pickle restore slots with setattr, which frozen instances reject
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
+
+def _date_chunks(start_date: str, end_date: str) -> List[Tuple[str, str]]:
+    """Split an inclusive ISO date range into consecutive HISTORICAL_CHUNK_DAYS ranges"""
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    
+    chunks = []
+    while start <= end:
+        chunk_end = min(start + timedelta(days=HISTORICAL_CHUNK_DAYS - 1), end)
+        chunks.append((start.isoformat(), chunk_end.isoformat()))
+        start = chunk_end + timedelta(days=1)
+    return chunks
+
+def _response_cache_path(latitude: float, longitude: float, *query: str) -> str:
+    """Cache file for one location's response to a query (e.g. a date range)"""
+    key = hashlib.sha1("|".join((f"{latitude:.4f}", f"{longitude:.4f}") + query).encode()).hexdigest()
+    return os.path.join(RESPONSE_CACHE_DIR, key + RESPONSE_CACHE_SUFFIX)
+
+def _read_response_cache(path: str, max_age: Optional[float] = None) -> Optional[bytes]:
+    """Cached response body, or None when missing or older than max_age seconds"""
+    try:
+        if max_age is not None and time.time() - os.path.getmtime(path) > max_age:
+            return None
+        with open(path, 'rb') as f:
+            return _cache_codec.decompress(f.read())
+    except (OSError, RuntimeError, EOFError):
+        return None
+
+def _write_response_cache(path: str, content: bytes):
+    """Store a response body, renaming into place so readers never see a partial file"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(_cache_codec.compress(content))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not cache weather response: {e}")
+
+@lru_cache(maxsize=1)
+def _get_http_session() -> requests.Session:
+    """Process-wide HTTP session so every service instance (cron, training pipeline, API) shares one warm pool"""
+    session = requests.Session()
+    session.headers.update({
+        'User-Agent': 'SDSS-Flood-Prediction/1.0'
+    })
+    adapter = HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=32,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
 
 class OpenMeteoService:
     """Service for fetching weather data from Open-Meteo API"""
     
     def __init__(self):
         self.base_url = "https://api.open-meteo.com/v1"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'SDSS-Flood-Prediction/1.0'
-        })
+        self.session = _get_http_session()
     
-    def get_current_weather(self, latitude: float, longitude: float) -> WeatherData:
-        """Get current weather data for a location"""
+    def get_current_weather(self, latitude: float, longitude: float, use_cache: bool = True) -> WeatherData:
+        """Get current weather data for a location, reusing a response fetched in the last CURRENT_CACHE_TTL seconds"""
+        cache_path = _response_cache_path(latitude, longitude, 'current')
+        if use_cache:
+            content = _read_response_cache(cache_path, CURRENT_CACHE_TTL)
+            if content is not None:
+                return self._parse_current_weather(content, latitude, longitude)
+        
         url = f"{self.base_url}/forecast"
-        params = {
-            'latitude': latitude,
-            'longitude': longitude,
-            'current': [
-                'temperature_2m',
-                'relative_humidity_2m',
-                'surface_pressure',
-                'wind_speed_10m',
-                'wind_direction_10m',
-                'precipitation'
-            ],
-            'timezone': 'auto'
-        }
+        params = self._current_weather_params(latitude, longitude)
         
         try:
             response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
-            data = response.json()
-            
-            current = data['current']
-            
-            return WeatherData(
-                timestamp=datetime.fromisoformat(current['time'].replace('Z', '+00:00')),
-                temperature=current['temperature_2m'],
-                humidity=current['relative_humidity_2m'],
-                pressure=current['surface_pressure'],
-                wind_speed=current['wind_speed_10m'],
-                wind_direction=current['wind_direction_10m'],
-                precipitation=current['precipitation'],
-                latitude=latitude,
-                longitude=longitude,
-                raw_data=data
-            )
+            weather_data = self._parse_current_weather(response.content, latitude, longitude)
+            _write_response_cache(cache_path, response.content)
+            return weather_data
             
         except requests.RequestException as e:
             logger.error(f"Failed to fetch weather data: {e}")
             raise
-        except KeyError as e:
+        except (KeyError, ValueError) as e:
             logger.error(f"Unexpected API response format: {e}")
             raise
     
     def get_historical_weather(self, latitude: float, longitude: float, 
-                             start_date: str, end_date: str) -> List[WeatherData]:
-        """Get historical weather data for a date range"""
+                             start_date: str, end_date: str, use_cache: bool = True) -> List[WeatherData]:
+        """Get historical weather data for a date range, served from the on-disk cache when possible"""
+        cache_path = _response_cache_path(latitude, longitude, start_date, end_date)
+        if use_cache:
+            max_age = HISTORICAL_CACHE_TTL if end_date >= date.today().isoformat() else None
+            content = _read_response_cache(cache_path, max_age)
+            if content is not None:
+                return self._parse_historical_weather(content, latitude, longitude)
+        
         url = f"{self.base_url}/forecast"
-        params = {
+        params = self._historical_weather_params(latitude, longitude, start_date, end_date)
+        
+        try:
+            response = self.session.get(url, params=params, timeout=HISTORICAL_TIMEOUT)
+            response.raise_for_status()
+            weather_data_list = self._parse_historical_weather(response.content, latitude, longitude)
+            
+            # Cache only responses that parsed, so a malformed body is refetched next time
+            _write_response_cache(cache_path, response.content)
+            return weather_data_list
+            
+        except requests.RequestException as e:
+            logger.error(f"Failed to fetch historical weather data: {e}")
+            raise
+        except (KeyError, ValueError) as e:
+            logger.error(f"Unexpected API response format: {e}")
+            raise
+    
+    async def get_current_weather_async(self, session: aiohttp.ClientSession,
+                                        latitude: float, longitude: float) -> WeatherData:
+        """Get current weather data for a location over a shared aiohttp session"""
+        async with session.get(
+            f"{self.base_url}/forecast",
+            params=self._current_weather_params(latitude, longitude)
+        ) as response:
+            response.raise_for_status()
+            content = await response.read()
+        
+        return self._parse_current_weather(content, latitude, longitude)
+    
+    async def get_historical_weather_async(self, session: aiohttp.ClientSession,
+                                           latitude: float, longitude: float,
+                                           start_date: str, end_date: str) -> List[WeatherData]:
+        """Get historical weather data for a date range over a shared aiohttp session"""
+        async with session.get(
+            f"{self.base_url}/forecast",
+            params=self._historical_weather_params(latitude, longitude, start_date, end_date)
+        ) as response:
+            response.raise_for_status()
+            content = await response.read()
+        
+        return self._parse_historical_weather(content, latitude, longitude)
+    
+    def get_historical_weather_for_locations(self, locations: List[Tuple[float, float]],
+                                             start_date: str, end_date: str,
+                                             max_concurrency: int = 8) -> Dict[Tuple[float, float], List[WeatherData]]:
+        """Get historical weather data for several locations with concurrent requests"""
+        return asyncio.run(self.get_historical_weather_for_locations_async(
+            locations, start_date, end_date, max_concurrency
+        ))
+    
+    async def get_historical_weather_for_locations_async(self, locations: List[Tuple[float, float]],
+                                                         start_date: str, end_date: str,
+                                                         max_concurrency: int = 8) -> Dict[Tuple[float, float], List[WeatherData]]:
+        """Fetch historical weather for each location, skipping locations whose request fails"""
+        # Bound the number of in-flight Open-Meteo requests
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def fetch(session: aiohttp.ClientSession, latitude: float, longitude: float) -> List[WeatherData]:
+            async with semaphore:
+                return await self.get_historical_weather_async(
+                    session, latitude, longitude, start_date, end_date
+                )
+        
+        async with aiohttp.ClientSession(
+            headers={'User-Agent': self.session.headers['User-Agent']},
+            timeout=aiohttp.ClientTimeout(total=HISTORICAL_TIMEOUT),
+            connector=aiohttp.TCPConnector(limit=32)
+        ) as session:
+            results = await asyncio.gather(*[
+                fetch(session, latitude, longitude) for latitude, longitude in locations
+            ], return_exceptions=True)
+        
+        weather_by_location = {}
+        for location, result in zip(locations, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to fetch historical weather data for {location}: {result}")
+            else:
+                weather_by_location[location] = result
+        
+        return weather_by_location
+    
+    async def get_current_weather_for_locations_async(self, locations: List[Tuple[float, float]],
+                                                      max_concurrency: int = 8,
+                                                      use_cache: bool = True) -> List[Union[WeatherData, Exception]]:
+        """Fetch current weather for each location concurrently; a failed location yields its exception"""
+        if not locations:
+            return []
+        
+        # Locations fetched within the last CURRENT_CACHE_TTL seconds are served from disk
+        results: List[Union[WeatherData, Exception, None]] = [None] * len(locations)
+        if use_cache:
+            for index, (latitude, longitude) in enumerate(locations):
+                content = _read_response_cache(_response_cache_path(latitude, longitude, 'current'), CURRENT_CACHE_TTL)
+                if content is not None:
+                    results[index] = self._parse_current_weather(content, latitude, longitude)
+        
+        missing = [index for index, result in enumerate(results) if result is None]
+        if missing:
+            fetched = await self._fetch_current_weather_for_locations_async(
+                [locations[index] for index in missing], max_concurrency
+            )
+            for index, result in zip(missing, fetched):
+                results[index] = result
+                if not isinstance(result, Exception):
+                    _write_response_cache(_response_cache_path(*locations[index], 'current'), result.raw_bytes)
+        
+        return results
+    
+    async def _fetch_current_weather_for_locations_async(self, locations: List[Tuple[float, float]],
+                                                         max_concurrency: int) -> List[Union[WeatherData, Exception]]:
+        """Request current weather for each location from Open-Meteo, bypassing the cache"""
+        # Bound the number of in-flight Open-Meteo requests
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def fetch(session: aiohttp.ClientSession, latitude: float, longitude: float) -> WeatherData:
+            async with semaphore:
+                return await self.get_current_weather_async(session, latitude, longitude)
+        
+        async with aiohttp.ClientSession(
+            headers={'User-Agent': self.session.headers['User-Agent']},
+            timeout=aiohttp.ClientTimeout(total=10),
+            connector=aiohttp.TCPConnector(limit=32)
+        ) as session:
+            # One multi-coordinate request covers every location; fall back to a request each
+            if len(locations) > 1:
+                try:
+                    return await self.get_current_weather_batched_async(session, locations)
+                except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, TypeError, ValueError) as e:
+                    logger.error(f"Batched weather request failed, fetching locations individually: {e}")
+            
+            return await asyncio.gather(*[
+                fetch(session, latitude, longitude) for latitude, longitude in locations
+            ], return_exceptions=True)
+    
+    async def get_current_weather_batched_async(self, session: aiohttp.ClientSession,
+                                                locations: List[Tuple[float, float]]) -> List[WeatherData]:
+        """Get current weather for every location from one multi-coordinate request"""
+        async with session.get(
+            f"{self.base_url}/forecast",
+            params=self._current_weather_params(
+                ','.join(str(latitude) for latitude, _ in locations),
+                ','.join(str(longitude) for _, longitude in locations)
+            )
+        ) as response:
+            response.raise_for_status()
+            content = await response.read()
+        
+        # Open-Meteo returns one response object per coordinate, in request order
+        payload = _loads(content)
+        if isinstance(payload, dict):
+            return [self._build_current_weather(payload, *locations[0], content)]
+        if len(payload) != len(locations):
+            raise ValueError(f"Expected {len(locations)} locations in batched response, got {len(payload)}")
+        
+        return [
+            self._build_current_weather(data, latitude, longitude, _dumps(data).encode())
+            for (latitude, longitude), data in zip(locations, payload)
+        ]
+    
+    def _current_weather_params(self, latitude: float, longitude: float) -> Dict[str, Any]:
+        """Build query parameters for a current weather request"""
+        return {
+            'latitude': latitude,
+            'longitude': longitude,
+            'current': ','.join([
+                'temperature_2m',
+                'relative_humidity_2m',
+                'surface_pressure',
+                'wind_speed_10m',
+                'wind_direction_10m',
+                'precipitation'
+            ]),
+            'timezone': 'auto'
+        }
+    
+    def _historical_weather_params(self, latitude: float, longitude: float,
+                                   start_date: str, end_date: str) -> Dict[str, Any]:
+        """Build query parameters for a daily historical weather request"""
+        return {
             'latitude': latitude,
             'longitude': longitude,
             'start_date': start_date,
             'end_date': end_date,
-            'daily': [
+            'daily': ','.join([
                 'temperature_2m_mean',
                 'relative_humidity_2m_mean',
                 'surface_pressure_mean',
                 'wind_speed_10m_mean',
                 'wind_direction_10m_mean',
                 'precipitation_sum'
-            ],
+            ]),
             'timezone': 'auto'
         }
+    
+    def _parse_current_weather(self, content: bytes, latitude: float, longitude: float) -> WeatherData:
+        """Build WeatherData from a current weather response body"""
+        return self._build_current_weather(_loads(content), latitude, longitude, content)
+    
+    def _build_current_weather(self, data: Dict[str, Any], latitude: float, longitude: float,
+                               raw_bytes: bytes) -> WeatherData:
+        """Build WeatherData from one location's parsed current weather response"""
+        current = data['current']
         
-        try:
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            weather_data = []
-            daily = data['daily']
-            
-            for i, date_str in enumerate(daily['time']):
-                weather_data.append(WeatherData(
-                    timestamp=datetime.fromisoformat(date_str),
-                    temperature=daily['temperature_2m_mean'][i],
-                    humidity=daily['relative_humidity_2m_mean'][i],
-                    pressure=daily['surface_pressure_mean'][i],
-                    wind_speed=daily['wind_speed_10m_mean'][i],
-                    wind_direction=daily['wind_direction_10m_mean'][i],
-                    precipitation=daily['precipitation_sum'][i],
-                    latitude=latitude,
-                    longitude=longitude,
-                    raw_data=data
-                ))
-            
-            return weather_data
-            
-        except requests.RequestException as e:
-            logger.error(f"Failed to fetch historical weather data: {e}")
-            raise
-        except KeyError as e:
-            logger.error(f"Unexpected API response format: {e}")
-            raise
+        return WeatherData(
+            timestamp=datetime.fromisoformat(current['time'].replace('Z', '+00:00')),
+            temperature=current['temperature_2m'],
+            humidity=current['relative_humidity_2m'],
+            pressure=current['surface_pressure'],
+            wind_speed=current['wind_speed_10m'],
+            wind_direction=current['wind_direction_10m'],
+            precipitation=current['precipitation'],
+            latitude=latitude,
+            longitude=longitude,
+            raw_bytes=raw_bytes
+        )
+    
+    def _parse_historical_weather(self, content: bytes, latitude: float, longitude: float) -> List[WeatherData]:
+        """Build one WeatherData per day from a daily historical weather response body"""
+        daily = _loads(content)['daily']
+        
+        # Parse every date in one vectorized call
+        timestamps = pd.to_datetime(daily['time']).to_pydatetime()
+        
+        return [
+            WeatherData(
+                timestamp=timestamp,
+                temperature=temperature,
+                humidity=humidity,
+                pressure=pressure,
+                wind_speed=wind_speed,
+                wind_direction=wind_direction,
+                precipitation=precipitation,
+                latitude=latitude,
+                longitude=longitude,
+                raw_bytes=content
+            )
+            for timestamp, temperature, humidity, pressure, wind_speed, wind_direction, precipitation in zip(
+                timestamps,
+                daily['temperature_2m_mean'],
+                daily['relative_humidity_2m_mean'],
+                daily['surface_pressure_mean'],
+                daily['wind_speed_10m_mean'],
+                daily['wind_direction_10m_mean'],
+                daily['precipitation_sum']
+            )
+        ]
 
 class WeatherDataIngestion:
     """Service for ingesting weather data into the database"""
@@ -159,6 +474,12 @@ class WeatherDataIngestion:
             'wind_speed': 'WIND',
             'precipitation': 'RAIN'
         }
+        
+        # Sensor IDs by (lat, lon), filled by ensure_weather_sensors_exist
+        self._sensor_id_cache: Dict[Tuple[float, float], Dict[str, str]] = {}
+        
+        # Cleared if the training_weather_by_location database function is missing
+        self._training_rpc_available = True
     
     def ensure_weather_sensors_exist(self, latitude: float, longitude: float) -> Dict[str, str]:
         """Ensure weather sensors exist in the database, create if not"""
@@ -166,29 +487,49 @@ class WeatherDataIngestion:
             logger.warning("Database not available, returning empty sensor IDs")
             return {}
         
+        # Sensors are never deleted, so a complete set found once stays valid
+        cache_key = (latitude, longitude)
+        cached = self._sensor_id_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+        
+        # Look up every existing sensor type at this location in one query
+        result = self.supabase.table('sensors').select('id,type').in_(
+            'type', list(self.weather_sensor_types.values())
+        ).eq('lat', latitude).eq('lon', longitude).execute()
+        existing = {}
+        for row in result.data or []:
+            existing.setdefault(row['type'], row['id'])
+        
         sensor_ids = {}
+        to_create = []
         
         for sensor_name, sensor_type in self.weather_sensor_types.items():
-            # Check if sensor already exists
-            result = self.supabase.table('sensors').select('id').eq('type', sensor_type).eq('lat', latitude).eq('lon', longitude).execute()
-            
-            if result.data:
-                sensor_ids[sensor_name] = result.data[0]['id']
+            if sensor_type in existing:
+                sensor_ids[sensor_name] = existing[sensor_type]
             else:
-                # Create new sensor
-                sensor_data = {
+                # Queue new sensor
+                to_create.append({
                     'name': f"Weather {sensor_name.title()} Sensor",
                     'type': sensor_type,
                     'lat': latitude,
                     'lon': longitude,
                     'elevation': 0.0  # Default elevation
-                }
-                
-                result = self.supabase.table('sensors').insert(sensor_data).execute()
-                if result.data:
-                    sensor_ids[sensor_name] = result.data[0]['id']
+                })
+        
+        # Create all missing sensors in one insert and map the new IDs back by type
+        if to_create:
+            result = self.supabase.table('sensors').insert(to_create).execute()
+            created = {row['type']: row['id'] for row in result.data or []}
+            for sensor_name, sensor_type in self.weather_sensor_types.items():
+                if sensor_type in created:
+                    sensor_ids[sensor_name] = created[sensor_type]
                     logger.info(f"Created new {sensor_name} sensor: {sensor_ids[sensor_name]}")
         
+        # Only cache complete sets so a failed sensor creation is retried next time
+        if len(sensor_ids) == len(self.weather_sensor_types):
+            self._sensor_id_cache[cache_key] = dict(sensor_ids)
+        
         return sensor_ids
     
     def store_weather_data(self, weather_data: WeatherData, sensor_ids: Dict[str, str]):
@@ -197,6 +538,10 @@ class WeatherDataIngestion:
             logger.warning("Database not available, skipping data storage")
             return
         
+        self.insert_readings(self.build_readings(weather_data, sensor_ids))
+    
+    def build_readings(self, weather_data: WeatherData, sensor_ids: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Map weather data onto sensor_readings rows for the given sensors"""
         readings = []
         
         # Map weather data to sensor readings
@@ -208,36 +553,42 @@ class WeatherDataIngestion:
             'precipitation': weather_data.precipitation
         }
         
+        # Every reading shares the same raw envelope; the API body is embedded verbatim
+        timestamp = weather_data.timestamp.isoformat()
+        raw = _dumps({'source': 'open-meteo', 'timestamp': timestamp})
+        raw = f'{raw[:-1]},"full_data":{weather_data.raw_bytes.decode()}}}'
+        
         for sensor_name, value in sensor_mappings.items():
             if sensor_name in sensor_ids and value is not None:
                 reading = {
                     'sensor_id': sensor_ids[sensor_name],
-                    'ts': weather_data.timestamp.isoformat(),
+                    'ts': timestamp,
                     'value': float(value),
                     'status': 'OK',
                     'lat': weather_data.latitude,
                     'lon': weather_data.longitude,
-                    'raw': json.dumps({
-                        'source': 'open-meteo',
-                        'timestamp': weather_data.timestamp.isoformat(),
-                        'full_data': weather_data.raw_data
-                    })
+                    'raw': raw
                 }
                 readings.append(reading)
         
-        # Insert all readings
-        if readings:
-            result = self.supabase.table('sensor_readings').insert(readings).execute()
-            if result.data:
-                logger.info(f"Stored {len(readings)} weather readings")
-            else:
-                logger.error(f"Failed to store weather readings: {result}")
+        return readings
+    
+    def insert_readings(self, readings: List[Dict[str, Any]], batch_size: int = INSERT_BATCH_SIZE):
+        """Upsert sensor readings in batches of at most batch_size rows"""
+        for start in range(0, len(readings), batch_size):
+            batch = readings[start:start + batch_size]
+            # Re-ingesting a range updates existing (sensor_id, ts) rows instead of duplicating them;
+            # failures raise, so the stored rows need not be echoed back
+            self.supabase.table('sensor_readings').upsert(
+                batch, on_conflict='sensor_id,ts', returning=ReturnMethod.minimal
+            ).execute()
+            logger.info(f"Stored {len(batch)} weather readings")
     
-    def ingest_current_weather(self, latitude: float, longitude: float):
+    def ingest_current_weather(self, latitude: float, longitude: float, use_cache: bool = True):
         """Ingest current weather data for a location"""
         try:
             # Get current weather data
-            weather_data = self.weather_service.get_current_weather(latitude, longitude)
+            weather_data = self.weather_service.get_current_weather(latitude, longitude, use_cache)
             
             # Ensure sensors exist
             sensor_ids = self.ensure_weather_sensors_exist(latitude, longitude)
@@ -252,21 +603,66 @@ class WeatherDataIngestion:
             logger.error(f"Failed to ingest current weather: {e}")
             raise
     
+    def ingest_current_weather_for_locations(self, locations: List[Tuple[float, float]],
+                                             max_concurrency: int = 8,
+                                             use_cache: bool = True) -> List[Union[WeatherData, Exception]]:
+        """Ingest current weather for several locations, fetching them concurrently"""
+        results = asyncio.run(self.weather_service.get_current_weather_for_locations_async(
+            locations, max_concurrency, use_cache
+        ))
+        
+        if not self.supabase:
+            logger.warning("Database not available, skipping data storage")
+            return results
+        
+        # Store every location's readings with one insert; a failing location only fails itself
+        readings = []
+        for i, ((latitude, longitude), result) in enumerate(zip(locations, results)):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to fetch current weather for {latitude}, {longitude}: {result}")
+                continue
+            try:
+                sensor_ids = self.ensure_weather_sensors_exist(latitude, longitude)
+                readings.extend(self.build_readings(result, sensor_ids))
+            except Exception as e:
+                logger.error(f"Failed to prepare weather sensors for {latitude}, {longitude}: {e}")
+                results[i] = e
+        self.insert_readings(readings)
+        
+        ingested = sum(not isinstance(result, Exception) for result in results)
+        logger.info(f"Successfully ingested current weather for {ingested} of {len(locations)} locations")
+        return results
+    
     def ingest_historical_weather(self, latitude: float, longitude: float, 
-                                start_date: str, end_date: str):
+                                start_date: str, end_date: str, use_cache: bool = True):
         """Ingest historical weather data for a date range"""
         try:
-            # Get historical weather data
-            weather_data_list = self.weather_service.get_historical_weather(
-                latitude, longitude, start_date, end_date
-            )
-            
-            # Ensure sensors exist
-            sensor_ids = self.ensure_weather_sensors_exist(latitude, longitude)
+            with ThreadPoolExecutor(max_workers=HISTORICAL_FETCH_WORKERS) as executor:
+                # Fetch date chunks in the background, in date order
+                futures = [
+                    executor.submit(
+                        self.weather_service.get_historical_weather,
+                        latitude, longitude, chunk_start, chunk_end, use_cache
+                    )
+                    for chunk_start, chunk_end in _date_chunks(start_date, end_date)
+                ]
+                
+                # Ensure sensors exist while the first chunks download
+                sensor_ids = self.ensure_weather_sensors_exist(latitude, longitude)
+                
+                # Store each chunk as it arrives so inserts overlap the remaining fetches
+                weather_data_list = []
+                for future in futures:
+                    chunk = future.result()
+                    weather_data_list.extend(chunk)
+                    if self.supabase:
+                        readings = []
+                        for weather_data in chunk:
+                            readings.extend(self.build_readings(weather_data, sensor_ids))
+                        self.insert_readings(readings)
             
-            # Store all data
-            for weather_data in weather_data_list:
-                self.store_weather_data(weather_data, sensor_ids)
+            if not self.supabase:
+                logger.warning("Database not available, skipping data storage")
             
             logger.info(f"Successfully ingested {len(weather_data_list)} historical weather records")
             return weather_data_list
@@ -275,6 +671,52 @@ class WeatherDataIngestion:
             logger.error(f"Failed to ingest historical weather: {e}")
             raise
     
+    def ingest_historical_weather_for_locations(self, locations: List[Tuple[float, float]],
+                                                start_date: str, end_date: str,
+                                                max_concurrency: int = 8) -> Dict[Tuple[float, float], List[WeatherData]]:
+        """Ingest historical weather data for several locations, fetching them concurrently"""
+        try:
+            weather_by_location = self.weather_service.get_historical_weather_for_locations(
+                locations, start_date, end_date, max_concurrency
+            )
+            
+            # Store every location's readings with as few inserts as possible
+            if self.supabase:
+                all_readings = []
+                for (latitude, longitude), weather_data_list in weather_by_location.items():
+                    sensor_ids = self.ensure_weather_sensors_exist(latitude, longitude)
+                    for weather_data in weather_data_list:
+                        all_readings.extend(self.build_readings(weather_data, sensor_ids))
+                self.insert_readings(all_readings)
+            else:
+                logger.warning("Database not available, skipping data storage")
+            
+            logger.info(f"Successfully ingested historical weather for {len(weather_by_location)} of {len(locations)} locations")
+            return weather_by_location
+            
+        except Exception as e:
+            logger.error(f"Failed to ingest historical weather: {e}")
+            raise
+    
+    def count_new_samples(self, latitude: float, longitude: float, since: datetime) -> int:
+        """Count weather samples stored for a location after a point in time (one TEMP reading each)"""
+        # ts is timestamptz: send an explicit offset (a naive since is taken as local time)
+        if not self.supabase:
+            return 0
+        
+        result = self.supabase.table('sensors').select('id').eq('type', 'TEMP').eq(
+            'lat', latitude
+        ).eq('lon', longitude).execute()
+        sensor_ids = [row['id'] for row in result.data or []]
+        if not sensor_ids:
+            return 0
+        
+        # Only the exact count is needed, so fetch at most one row
+        result = self.supabase.table('sensor_readings').select('id', count='exact').in_(
+            'sensor_id', sensor_ids
+        ).gt('ts', since.astimezone(timezone.utc).isoformat()).limit(1).execute()
+        return result.count or 0
+    
     def get_weather_data_for_training(self, latitude: float, longitude: float, 
                                     days_back: int = 30) -> List[Dict[str, Any]]:
         """Get weather data from database for ML model training"""
@@ -287,51 +729,50 @@ class WeatherDataIngestion:
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days_back)
             
-            # Get sensor IDs for this location
-            sensor_ids = {}
-            for sensor_type in self.weather_sensor_types.values():
-                result = self.supabase.table('sensors').select('id').eq('type', sensor_type).eq('lat', latitude).eq('lon', longitude).execute()
-                if result.data:
-                    sensor_ids[sensor_type] = result.data[0]['id']
+            # Let Postgres pivot the readings when training_weather_by_location is deployed
+            if self._training_rpc_available:
+                try:
+                    result = self.supabase.rpc('training_weather_by_location', {
+                        'p_lat': latitude,
+                        'p_lon': longitude,
+                        'p_from': start_date.isoformat(),
+                        'p_to': end_date.isoformat()
+                    }).execute()
+                    training_data = self._rpc_training_records(result.data or [])
+                    logger.info(f"Retrieved {len(training_data)} weather records for training")
+                    return training_data
+                except Exception as e:
+                    # Only a missing function disables the RPC; other failures fall back for this call
+                    if isinstance(e, APIError) and str(e.code) in MISSING_RPC_ERROR_CODES:
+                        logger.warning(f"training_weather_by_location unavailable, grouping readings in Python: {e}")
+                        self._training_rpc_available = False
+                    else:
+                        logger.warning(f"training_weather_by_location failed, grouping readings in Python: {e}")
+            
+            # Get sensor IDs for this location in one query
+            result = self.supabase.table('sensors').select('id,type').in_(
+                'type', list(self.weather_sensor_types.values())
+            ).eq('lat', latitude).eq('lon', longitude).execute()
+            sensor_columns = {}
+            for row in result.data or []:
+                column = SENSOR_TYPE_COLUMNS.get(row['type'])
+                if column and column not in sensor_columns.values():
+                    sensor_columns[row['id']] = column
             
-            if not sensor_ids:
+            if not sensor_columns:
                 logger.warning(f"No weather sensors found for location {latitude}, {longitude}")
                 return []
             
-            # Get readings for all sensors
-            all_readings = []
-            for sensor_type, sensor_id in sensor_ids.items():
-                result = self.supabase.table('sensor_readings').select('*').eq('sensor_id', sensor_id).gte('ts', start_date.isoformat()).lte('ts', end_date.isoformat()).order('ts').execute()
-                
-                if result.data:
-                    all_readings.extend(result.data)
+            # Get readings for all sensors in one query
+            result = self.supabase.table('sensor_readings').select('sensor_id,ts,value').in_('sensor_id', list(sensor_columns)).gte('ts', start_date.isoformat()).lte('ts', end_date.isoformat()).order('ts').execute()
             
-            # Group readings by timestamp
-            grouped_data = {}
-            for reading in all_readings:
+            # Group readings by timestamp, mapping each sensor to its weather parameter name
+            grouped_data = defaultdict(dict)
+            for reading in result.data or []:
                 ts = reading['ts']
-                if ts not in grouped_data:
-                    grouped_data[ts] = {'timestamp': ts}
-                
-                # Map sensor type to reading value
-                sensor_type = None
-                for stype, sid in sensor_ids.items():
-                    if sid == reading['sensor_id']:
-                        sensor_type = stype
-                        break
-                
-                if sensor_type:
-                    # Map to weather parameter names
-                    if sensor_type == 'TEMP':
-                        grouped_data[ts]['temperature'] = reading['value']
-                    elif sensor_type == 'HUMIDITY':
-                        grouped_data[ts]['humidity'] = reading['value']
-                    elif sensor_type == 'PRESSURE':
-                        grouped_data[ts]['pressure'] = reading['value']
-                    elif sensor_type == 'WIND':
-                        grouped_data[ts]['wind_speed'] = reading['value']
-                    elif sensor_type == 'RAIN':
-                        grouped_data[ts]['precipitation'] = reading['value']
+                record = grouped_data[ts]
+                record['timestamp'] = ts
+                record[sensor_columns[reading['sensor_id']]] = reading['value']
             
             # Convert to list and sort by timestamp
             training_data = list(grouped_data.values())
@@ -344,6 +785,18 @@ class WeatherDataIngestion:
             logger.error(f"Failed to get weather data for training: {e}")
             return []
 
+    def _rpc_training_records(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Shape pivoted rows from training_weather_by_location like the grouped readings"""
+        records = []
+        for row in rows:
+            record = {'timestamp': row['ts']}
+            record.update(
+                (column, row[column]) for column in SENSOR_TYPE_COLUMNS.values()
+                if row.get(column) is not None
+            )
+            records.append(record)
+        return records
+
 # Global instance
 weather_ingestion = WeatherDataIngestion()
 
@@ -353,9 +806,14 @@ def ingest_weather_for_location(latitude: float, longitude: float):
     return weather_ingestion.ingest_current_weather(latitude, longitude)
 
 def ingest_historical_weather_for_location(latitude: float, longitude: float, 
-                                         start_date: str, end_date: str):
+                                         start_date: str, end_date: str, use_cache: bool = True):
     """Ingest historical weather data for a specific location"""
-    return weather_ingestion.ingest_historical_weather(latitude, longitude, start_date, end_date)
+    return weather_ingestion.ingest_historical_weather(latitude, longitude, start_date, end_date, use_cache)
+
+def ingest_historical_weather_for_locations(locations: List[Tuple[float, float]],
+                                            start_date: str, end_date: str):
+    """Ingest historical weather data for several locations concurrently"""
+    return weather_ingestion.ingest_historical_weather_for_locations(locations, start_date, end_date)
 
 def get_weather_training_data(latitude: float, longitude: float, days_back: int = 30):
     """Get weather data for ML model training"""
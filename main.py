@@ -1,30 +1,65 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, ConfigDict
+from typing import List, Dict, Any, Iterator, Optional
 import uvicorn
 import numpy as np
+import orjson
+import pandas as pd
 from datetime import datetime, timedelta
-import random
+from bisect import bisect_left
+from functools import lru_cache
+from types import MappingProxyType
+from concurrent.futures import Future, ProcessPoolExecutor
+import asyncio
+import multiprocessing
 import os
-import sys
+import threading
+import time
+import uuid
+from cachetools import TTLCache
 
-# Add lib directory to path for imports
-sys.path.append(os.path.join(os.path.dirname(__file__), 'lib'))
+try:
+    from numba import njit
+except ImportError:  # numba is optional; kernels run as plain Python without it
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
 
-from ml_training_pipeline import nigeria_ml_pipeline, TrainingConfig
-from nigeria_weather_service import (
+from lib.ml_training_pipeline import nigeria_ml_pipeline, NigeriaMLTrainingPipeline, TrainingConfig, train_pipeline
+from lib.nigeria_weather_service import (
     nigeria_weather_service, 
     nigeria_weather_ingestion,
-    get_nigeria_state_weather,
-    get_nigeria_weather_forecast,
-    ingest_nigeria_weather_data,
-    get_nigeria_weather_training_data
+    create_async_http_session,
+    get_nigeria_state_weather_async,
+    get_nigeria_weather_forecast_async,
+    get_nigeria_weather_training_data_async
 )
 
+# Request models are read-only and drop unknown fields instead of carrying them along
+REQUEST_MODEL_CONFIG = ConfigDict(extra='ignore', frozen=True)
+
+class ConditionsModel(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+    
+    rainfall_24h: Optional[float] = None
+    rainfall_7d: Optional[float] = None
+    river_level: Optional[float] = None
+    soil_moisture: Optional[float] = None
+    temperature: Optional[float] = None
+    humidity: Optional[float] = None
+    pressure: Optional[float] = None
+    wind_speed: Optional[float] = None
+    wind_direction: Optional[float] = None
+
 class PredictionRequest(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+    
     horizon_hours: List[int]
-    current_conditions: Dict[str, Any] = {}
+    current_conditions: ConditionsModel = ConditionsModel()
     state_code: Optional[str] = None
 
 class PredictionResponse(BaseModel):
@@ -37,12 +72,24 @@ class PredictionResponse(BaseModel):
     region: Optional[str] = None
 
 class WeatherIngestRequest(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+    
     state_code: Optional[str] = None
     latitude: Optional[float] = None
     longitude: Optional[float] = None
     type: str = "current"
 
+class SensorRecord(BaseModel):
+    sensor_id: Optional[str] = None
+    value: Optional[float] = None
+    type: str = "UNKNOWN"
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    ts: Optional[str] = None
+
 class TrainingRequest(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+    
     use_real_data: bool = True
     state_codes: Optional[List[str]] = None
     days_back: int = 30
@@ -53,126 +100,476 @@ class TrainingRequest(BaseModel):
 app = FastAPI(
     title="Nigeria SDSS Flood Prediction API", 
     version="3.0.0",
-    description="Enhanced flood prediction system for Nigeria states using Open-Meteo weather data and ML models"
+    description="Enhanced flood prediction system for Nigeria states using Open-Meteo weather data and ML models",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
+# Compress larger JSON bodies (state listings, forecasts, training data) for clients that accept gzip
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# Added last so it is outermost: preflights are answered before any other middleware runs
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],  # Next.js dev server
     allow_credentials=True,
-    allow_methods=["*"],  # Allow all HTTP methods
-    allow_headers=["*"],  # Allow all headers
+    allow_methods=["GET", "POST"],  # The only methods the API serves
+    allow_headers=["content-type", "authorization"],
+    max_age=86400,  # Browsers may reuse a preflight result for a day
 )
 
+# Conditions assumed for sensor-triggered predictions until the database supplies them
+SENSOR_DEFAULT_CONDITIONS = MappingProxyType({
+    'rainfall_24h': 0,
+    'rainfall_7d': 0,
+    'river_level': 2.0,
+    'soil_moisture': 0.5,
+    'temperature': 25,
+    'humidity': 65,
+    'pressure': 1013,
+    'wind_speed': 3,
+    'wind_direction': 180
+})
+
+# Sensor types that trigger an immediate flood risk assessment
+CRITICAL_SENSOR_TYPES = frozenset({'RAIN', 'RIVER', 'WATER_LEVEL'})
+
+# Condition each critical sensor type reports and the factor converting its reading
+# (a water level reading is scaled to a river level estimate)
+SENSOR_CONDITION_UPDATES = MappingProxyType({
+    'RAIN': ('rainfall_24h', 1),
+    'RIVER': ('river_level', 1),
+    'WATER_LEVEL': ('river_level', 2)
+})
+
+# Horizons (hours) checked when a critical sensor reports
+SENSOR_ASSESSMENT_HORIZONS = [1, 6, 24]
+
+# Smallest change in a critical sensor's reading that triggers a new assessment;
+# assessed values expire with the response cache so steady readings are re-checked
+SENSOR_CHANGE_THRESHOLDS = MappingProxyType({'RAIN': 0.05, 'RIVER': 0.01, 'WATER_LEVEL': 0.01})
+
+# Static parts of the model info and root responses
+SUPPORTED_STATES = list(nigeria_ml_pipeline.nigeria_states)
+
+API_ENDPOINTS = MappingProxyType({
+    "POST /predict": "Get flood risk predictions for Nigeria states",
+    "GET /health": "Health check",
+    "POST /retrain": "Start retraining the Nigeria ML model in the background",
+    "GET /retrain/{job_id}": "Get the status of a retraining job",
+    "GET /model/info": "Get Nigeria model information",
+    "GET /dataset/generate": "Generate Nigeria sample dataset",
+    "POST /weather/ingest": "Ingest weather data for Nigeria states",
+    "GET /weather/training-data": "Get weather data for training",
+    "GET /nigeria/states": "Get all Nigeria states information",
+    "GET /nigeria/states/{state_code}/weather": "Get current weather for a state",
+    "GET /nigeria/states/{state_code}/forecast": "Get weather forecast for a state",
+    "GET /nigeria/regions": "Get Nigeria regions and their states",
+    "GET /": "API information"
+})
+
+def _states_by_region() -> Dict[str, List[Dict[str, str]]]:
+    """Nigeria states grouped by region, in state order"""
+    regions = {}
+    for state_code, state_info in nigeria_ml_pipeline.nigeria_states.items():
+        regions.setdefault(state_info['region'], []).append({
+            "code": state_code,
+            "name": state_info['name'],
+            "flood_risk": state_info['flood_risk']
+        })
+    return regions
+
+# The states and regions listings never change, so their bodies are encoded once
+STATES_BODY = orjson.dumps({
+    "status": "success",
+    "states": nigeria_ml_pipeline.nigeria_states,
+    "total_states": len(nigeria_ml_pipeline.nigeria_states)
+})
+_regions = _states_by_region()
+REGIONS_BODY = orjson.dumps({
+    "status": "success",
+    "regions": _regions,
+    "total_regions": len(_regions)
+})
+
+@lru_cache(maxsize=1)
+def _health_body(second: int, is_trained: bool) -> bytes:
+    """Encoded health response, rebuilt at most once a second or when training state changes"""
+    return orjson.dumps({
+        "status": "healthy", 
+        "timestamp": datetime.now().isoformat(),
+        "model_trained": is_trained,
+        "model_type": nigeria_ml_pipeline.type_name,
+        "nigeria_states_supported": len(nigeria_ml_pipeline.nigeria_states),
+        "api_version": "3.0.0"
+    })
+
+@lru_cache(maxsize=2)
+def _model_info_body(is_trained: bool) -> bytes:
+    """Encoded model info response; only the training state varies"""
+    return orjson.dumps({
+        "is_trained": is_trained,
+        "model_type": nigeria_ml_pipeline.type_name,
+        "features": nigeria_ml_pipeline.feature_columns,
+        "model_path": nigeria_ml_pipeline.model_path,
+        "nigeria_states_count": len(SUPPORTED_STATES),
+        "supported_states": SUPPORTED_STATES
+    })
+
+@lru_cache(maxsize=2)
+def _root_body(model_status: str) -> bytes:
+    """Encoded root response; only the model status varies"""
+    return orjson.dumps({
+        "name": "Nigeria SDSS Flood Prediction API",
+        "version": "3.0.0",
+        "description": "Enhanced flood prediction system for Nigeria states using Open-Meteo weather data and ML models",
+        "model_status": model_status,
+        "nigeria_states_supported": len(nigeria_ml_pipeline.nigeria_states),
+        "endpoints": dict(API_ENDPOINTS)
+    })
+
+@app.on_event("startup")
+async def ensure_model_trained():
+    """Train the Nigeria model on first boot if no trained artifacts exist"""
+    # Training runs its own event loop for the weather fetch, so keep it off the server's loop
+    await asyncio.to_thread(nigeria_ml_pipeline.train_if_needed)
+
+@app.on_event("startup")
+async def open_http_session():
+    """Open the aiohttp session shared by Open-Meteo requests from async endpoints"""
+    app.state.http_session = create_async_http_session()
+
+@app.on_event("shutdown")
+async def close_http_session():
+    """Close the shared aiohttp session"""
+    await app.state.http_session.close()
+
+@app.on_event("startup")
+async def start_prediction_batcher():
+    """Start grouping model calls from concurrent /predict requests"""
+    _prediction_batcher.start()
+
+@app.on_event("shutdown")
+async def stop_prediction_batcher():
+    """Stop the /predict micro-batcher"""
+    await _prediction_batcher.stop()
+
+# Uniform ranges for conditions missing from a prediction request
+DEFAULT_CONDITION_RANGES = {
+    'rainfall_24h': (0, 20),
+    'rainfall_7d': (0, 50),
+    'river_level': (1.5, 4.0),
+    'soil_moisture': (0.3, 0.8),
+    'temperature': (20, 30),
+    'humidity': (50, 80),
+    'pressure': (1000, 1020),
+    'wind_speed': (1, 10),
+    'wind_direction': (0, 360)
+}
+_CONDITION_LOW, _CONDITION_HIGH = np.array(list(DEFAULT_CONDITION_RANGES.values()), dtype=np.float64).T
+_CONDITION_KEYS = frozenset(DEFAULT_CONDITION_RANGES)
+
+# Simulated forecast rainfall upper bound (mm) for horizons up to 24h, up to 48h and beyond;
+# more rainfall is likely in shorter horizons
+FORECAST_HORIZON_EDGES = np.array([24, 48], dtype=np.float32)
+FORECAST_RAINFALL_UPPER = np.array([15.0, 25.0, 35.0])
+
+# Time-specific recommendation for the highest horizon risk; a risk must exceed a
+# threshold (bisect_left) to reach the next message
+HORIZON_RISK_THRESHOLDS = (0.4, 0.6, 0.8)
+HORIZON_RECOMMENDATIONS = (
+    None,
+    "WATCH: Monitor conditions closely",
+    "WARNING: Prepare for potential flooding",
+    "EMERGENCY: Evacuate low-lying areas immediately"
+)
+
+# Decimal places for each condition reported in the response factors
+FACTOR_PRECISION = {
+    'rainfall_24h': 1,
+    'river_level': 2,
+    'soil_moisture': 2,
+    'temperature': 1,
+    'humidity': 1,
+    'pressure': 1
+}
+
+# Whole /predict responses, keyed by horizons, state and quantized conditions
+RESPONSE_CACHE_SIZE = 1024
+RESPONSE_CACHE_TTL = 300
+_response_cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+_response_cache_lock = threading.Lock()
+
+# Last assessed value per sensor, for delta-triggered sensor predictions
+_sensor_last_values = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+_sensor_last_lock = threading.Lock()
+
+# Retraining runs in a single spawned worker process; jobs are polled by id
+RETRAIN_JOB_TTL = 24 * 3600
+_retrain_executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+_retrain_jobs = TTLCache(maxsize=32, ttl=RETRAIN_JOB_TTL)
+_retrain_lock = threading.Lock()
+_retrain_active: Optional[str] = None
+
+# Model rows from concurrent /predict cache misses are predicted together, up to
+# PREDICT_BATCH_SIZE rows per call and never waiting longer than PREDICT_BATCH_WAIT seconds
+PREDICT_BATCH_SIZE = 32
+PREDICT_BATCH_WAIT = 0.01
+
+class PredictionBatcher:
+    """Groups model rows queued by concurrent requests into one predict_rows call"""
+    
+    def __init__(self, max_batch_size: int = PREDICT_BATCH_SIZE, max_wait: float = PREDICT_BATCH_WAIT):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Start the batching task on the running event loop"""
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Cancel the batching task"""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+    
+    async def predict(self, features: tuple) -> float:
+        """Flood risk for one model row, predicted together with rows queued alongside it"""
+        flood_risk = nigeria_ml_pipeline.cached_prediction(features)
+        if flood_risk is not None:
+            return flood_risk
+        if self._worker is None:  # Not started (e.g. no lifespan), predict directly
+            return nigeria_ml_pipeline.predict_rows([features])[0]
+        
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((features, future))
+        return await future
+    
+    async def _run(self):
+        """Collect queued rows into batches and resolve each request's future"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size and loop.time() < deadline:
+                if self._queue.empty():
+                    # Let requests already in flight on this loop enqueue, but don't hold
+                    # a lone request for the full wait when nothing else is arriving
+                    await asyncio.sleep(0)
+                    if self._queue.empty():
+                        break
+                batch.append(self._queue.get_nowait())
+            
+            try:
+                results = await asyncio.to_thread(nigeria_ml_pipeline.predict_rows, [row for row, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), flood_risk in zip(batch, results):
+                if not future.done():
+                    future.set_result(flood_risk)
+
+_prediction_batcher = PredictionBatcher()
+
+# Rows encoded per chunk when streaming training data
+STREAM_CHUNK_ROWS = 1000
+
+# Shared generator for simulated conditions and forecast rainfall
+_rng = np.random.default_rng()
+
+@njit('Tuple((f4[:], f4[:]))(f4[:], f4[:], f4, f4)', cache=True, fastmath=True)
+def _horizon_risk_kernel(hours, forecast_rainfall, base_risk, base_confidence):
+    """Flood risk and confidence for each forecast horizon, clipped to their bounds"""
+    risk = np.empty(hours.shape[0], dtype=np.float32)
+    confidence = np.empty(hours.shape[0], dtype=np.float32)
+    cumulative_rainfall = np.float32(0.0)
+    for i in range(hours.shape[0]):
+        # Adjust risk based on cumulative forecast rainfall
+        cumulative_rainfall += forecast_rainfall[i]
+        forecast_factor = min(1.0, cumulative_rainfall / 50)
+        
+        # Time decay factor (uncertainty increases with time)
+        week_fraction = hours[i] / 168  # 168 hours = 1 week
+        time_factor = 1 + week_fraction * 0.3
+        
+        risk[i] = min(1.0, (base_risk + forecast_factor * 0.3) * time_factor)
+        
+        # Confidence decreases with longer horizons
+        confidence[i] = max(0.3, base_confidence * (1 - week_fraction * 0.4))
+    return risk, confidence
+
+@njit('f4[:](f4[:], f4[:, :], f4[:])', cache=True)
+def _max_horizon_risk_kernel(hours, forecast_rainfall, base_risk):
+    """Highest _horizon_risk_kernel risk over the horizons, for each row of a batch"""
+    max_risk = np.empty(base_risk.shape[0], dtype=np.float32)
+    for row in range(base_risk.shape[0]):
+        risk, _ = _horizon_risk_kernel(hours, forecast_rainfall[row], base_risk[row], np.float32(1.0))
+        max_risk[row] = risk.max()
+    return max_risk
+
+def _conditions_key(conditions: Dict[str, Any]) -> tuple:
+    """Known conditions with floats rounded to 2 decimals, so near-identical requests share a key"""
+    return tuple(
+        (key, round(conditions[key], 2) if isinstance(conditions[key], float) else conditions[key])
+        for key in DEFAULT_CONDITION_RANGES if key in conditions
+    )
+
+def _clear_prediction_caches():
+    """Forget cached predictions after the model changes"""
+    with _response_cache_lock:
+        _response_cache.clear()
+    with _sensor_last_lock:
+        _sensor_last_values.clear()
+
 def calculate_nigeria_flood_risk(horizon_hours: List[int], conditions: Dict[str, Any], 
                                 state_code: str = None) -> PredictionResponse:
     """
     Enhanced flood risk prediction using Nigeria-trained ML model
+    
+    Responses are cached for RESPONSE_CACHE_TTL seconds per horizon list, state and
+    quantized request conditions.
     """
-    # Get current conditions or use defaults
-    current_conditions = {
-        'rainfall_24h': conditions.get('rainfall_24h', random.uniform(0, 20)),
-        'rainfall_7d': conditions.get('rainfall_7d', random.uniform(0, 50)),
-        'river_level': conditions.get('river_level', random.uniform(1.5, 4.0)),
-        'soil_moisture': conditions.get('soil_moisture', random.uniform(0.3, 0.8)),
-        'temperature': conditions.get('temperature', random.uniform(20, 30)),
-        'humidity': conditions.get('humidity', random.uniform(50, 80)),
-        'pressure': conditions.get('pressure', random.uniform(1000, 1020)),
-        'wind_speed': conditions.get('wind_speed', random.uniform(1, 10)),
-        'wind_direction': conditions.get('wind_direction', random.uniform(0, 360))
-    }
+    try:
+        cache_key = (tuple(horizon_hours), state_code, _conditions_key(conditions))
+        with _response_cache_lock:
+            response = _response_cache.get(cache_key)
+    except TypeError:  # Unhashable condition values cannot be cached
+        return _compute_nigeria_flood_risk(horizon_hours, conditions, state_code)
+    
+    if response is None:
+        response = _compute_nigeria_flood_risk(horizon_hours, conditions, state_code)
+        with _response_cache_lock:
+            _response_cache[cache_key] = response
+    return response
+
+async def calculate_nigeria_flood_risk_async(horizon_hours: List[int], conditions: Dict[str, Any],
+                                            state_code: str = None) -> PredictionResponse:
+    """calculate_nigeria_flood_risk for the event loop; a cache miss's model call joins a micro-batch"""
+    try:
+        cache_key = (tuple(horizon_hours), state_code, _conditions_key(conditions))
+        with _response_cache_lock:
+            response = _response_cache.get(cache_key)
+    except TypeError:  # Unhashable condition values cannot be cached
+        return _compute_nigeria_flood_risk(horizon_hours, conditions, state_code)
+    
+    if response is None:
+        current_conditions = _current_conditions(conditions)
+        flood_risk = None
+        if nigeria_ml_pipeline.is_trained:
+            flood_risk = await _prediction_batcher.predict(
+                nigeria_ml_pipeline.feature_row(current_conditions, state_code)
+            )
+        response = _compute_nigeria_flood_risk(horizon_hours, current_conditions, state_code, flood_risk)
+        with _response_cache_lock:
+            _response_cache[cache_key] = response
+    return response
+
+def _current_conditions(conditions: Dict[str, Any]) -> Dict[str, Any]:
+    """Request conditions, drawing defaults in one vectorized call only when some are missing"""
+    # Complete requests (and already-filled conditions) are used as they are, without a copy
+    if conditions.keys() == _CONDITION_KEYS:
+        return conditions
     
-    # Get base prediction from Nigeria ML model
-    base_prediction = nigeria_ml_pipeline.predict_flood_risk(current_conditions, state_code)
+    current_conditions = {key: conditions[key] for key in DEFAULT_CONDITION_RANGES if key in conditions}
+    if len(current_conditions) < len(DEFAULT_CONDITION_RANGES):
+        defaults = _rng.uniform(_CONDITION_LOW, _CONDITION_HIGH).tolist()
+        current_conditions = {
+            key: conditions.get(key, default)
+            for key, default in zip(DEFAULT_CONDITION_RANGES, defaults)
+        }
+    return current_conditions
+
+def _compute_nigeria_flood_risk(horizon_hours: List[int], conditions: Dict[str, Any], 
+                                state_code: str = None, flood_risk: float = None) -> PredictionResponse:
+    """Build a flood risk prediction response without consulting the response cache"""
+    current_conditions = _current_conditions(conditions)
+    
+    # Get base prediction from Nigeria ML model (the pipeline caches scores for quantized rows)
+    base_prediction = nigeria_ml_pipeline.predict_flood_risk(current_conditions, state_code, flood_risk)
     base_risk = base_prediction['flood_risk']
     base_confidence = base_prediction['confidence']
     
-    # Simulate forecast rainfall for different horizons
-    forecast_rainfall = []
-    for hours in horizon_hours:
-        # More rainfall likely in shorter horizons
-        if hours <= 24:
-            forecast_rainfall.append(random.uniform(0, 15))
-        elif hours <= 48:
-            forecast_rainfall.append(random.uniform(0, 25))
-        else:
-            forecast_rainfall.append(random.uniform(0, 35))
+    # Horizon arithmetic runs in float32; values are widened only when rounded for the response
+    hours = np.asarray(horizon_hours, dtype=np.float32)
     
-    risk_scores = []
-    confidence_scores = []
+    # Simulate forecast rainfall for different horizons
+    rainfall_upper = FORECAST_RAINFALL_UPPER[np.searchsorted(FORECAST_HORIZON_EDGES, hours)]
+    forecast_rainfall = _rng.uniform(0, rainfall_upper).astype(np.float32)
     
-    for i, hours in enumerate(horizon_hours):
-        # Adjust risk based on forecast rainfall
-        forecast_factor = min(1.0, sum(forecast_rainfall[:i+1]) / 50)
-        
-        # Time decay factor (uncertainty increases with time)
-        time_factor = 1 + (hours / 168) * 0.3  # 168 hours = 1 week
-        
-        # Calculate adjusted risk
-        adjusted_risk = base_risk + (forecast_factor * 0.3)
-        adjusted_risk *= time_factor
-        adjusted_risk = min(1.0, adjusted_risk)
-        
-        risk_scores.append(round(adjusted_risk, 3))
-        
-        # Confidence decreases with longer horizons
-        confidence = base_confidence * (1 - (hours / 168) * 0.4)
-        confidence = max(0.3, confidence)
-        confidence_scores.append(round(confidence, 3))
+    # Adjust risk and confidence for every horizon in one compiled pass
+    adjusted_risk, confidence = _horizon_risk_kernel(
+        hours, forecast_rainfall, np.float32(base_risk), np.float32(base_confidence)
+    )
+    risk_scores = adjusted_risk.astype(np.float64).round(3).tolist()
+    confidence_scores = confidence.astype(np.float64).round(3).tolist()
     
-    # Use ML model recommendations as base
-    recommendations = base_prediction['recommendations'].copy()
+    # Use ML model recommendations as base, led by a time-specific one
+    recommendations = base_prediction['recommendations']
+    time_recommendation = HORIZON_RECOMMENDATIONS[bisect_left(HORIZON_RISK_THRESHOLDS, max(risk_scores))]
+    if time_recommendation:
+        recommendations = [time_recommendation, *recommendations]
     
-    # Add time-specific recommendations
-    max_risk = max(risk_scores)
-    if max_risk > 0.8:
-        recommendations.insert(0, "EMERGENCY: Evacuate low-lying areas immediately")
-    elif max_risk > 0.6:
-        recommendations.insert(0, "WARNING: Prepare for potential flooding")
-    elif max_risk > 0.4:
-        recommendations.insert(0, "WATCH: Monitor conditions closely")
+    factors = {key: round(current_conditions[key], digits) for key, digits in FACTOR_PRECISION.items()}
+    factors["forecast_rainfall"] = forecast_rainfall.astype(np.float64).round(1).tolist()
+    factors["model_used"] = nigeria_ml_pipeline.type_name
+    factors["state_risk"] = base_prediction.get('factors', {}).get('state_risk', 'medium')
     
-    return PredictionResponse(
-        horizon=horizon_hours,
+    # Every field is built here and already valid, so skip Pydantic validation
+    return PredictionResponse.model_construct(
+        horizon=list(horizon_hours),
         risk=risk_scores,
         confidence=confidence_scores,
-        factors={
-            "rainfall_24h": round(current_conditions['rainfall_24h'], 1),
-            "river_level": round(current_conditions['river_level'], 2),
-            "soil_moisture": round(current_conditions['soil_moisture'], 2),
-            "temperature": round(current_conditions['temperature'], 1),
-            "humidity": round(current_conditions['humidity'], 1),
-            "pressure": round(current_conditions['pressure'], 1),
-            "forecast_rainfall": [round(r, 1) for r in forecast_rainfall],
-            "model_used": "Nigeria GradientBoostingRegressor" if nigeria_ml_pipeline.is_trained else "Simple",
-            "state_risk": base_prediction.get('factors', {}).get('state_risk', 'medium')
-        },
+        factors=factors,
         recommendations=recommendations,
         state_code=state_code,
         region=base_prediction.get('region')
     )
 
 @app.post("/predict", response_model=PredictionResponse)
-def predict(req: PredictionRequest):
+async def predict(req: PredictionRequest):
     """Predict flood risk for given time horizons in Nigeria states"""
-    return calculate_nigeria_flood_risk(req.horizon_hours, req.current_conditions, req.state_code)
+    # Unset and null conditions are left out so they take the usual defaults
+    conditions = req.current_conditions.model_dump(exclude_none=True)
+    response = await calculate_nigeria_flood_risk_async(req.horizon_hours, conditions, req.state_code)
+    
+    # Returning the response directly skips FastAPI re-validating the model we just built;
+    # response_model stays on the route for the OpenAPI schema
+    return ORJSONResponse(response.model_dump())
 
 @app.get("/health")
-def health_check():
+async def health_check():
     """Health check endpoint"""
-    return {
-        "status": "healthy", 
-        "timestamp": datetime.now().isoformat(),
-        "model_trained": nigeria_ml_pipeline.is_trained,
-        "model_type": "Nigeria GradientBoostingRegressor" if nigeria_ml_pipeline.is_trained else "Simple",
-        "nigeria_states_supported": len(nigeria_ml_pipeline.nigeria_states),
-        "api_version": "3.0.0"
-    }
+    body = _health_body(int(time.time()), nigeria_ml_pipeline.is_trained)
+    return Response(body, media_type="application/json")
+
+def _install_pipeline(pipeline: NigeriaMLTrainingPipeline):
+    """Serve from a newly loaded pipeline; runs on the event loop so requests see one or the other"""
+    global nigeria_ml_pipeline
+    nigeria_ml_pipeline = pipeline
+    _clear_prediction_caches()
+
+def _finish_retrain(config: TrainingConfig, loop: asyncio.AbstractEventLoop, future: Future):
+    """Load the newly trained model into this process once its job succeeds"""
+    global _retrain_active
+    try:
+        if future.exception() is None:
+            # Load into a fresh pipeline off the loop; the live one is never modified in place
+            loop.call_soon_threadsafe(_install_pipeline, NigeriaMLTrainingPipeline(config))
+    except Exception as e:
+        print(f"⚠️ Failed to load retrained Nigeria model: {e}")
+    finally:
+        with _retrain_lock:
+            _retrain_active = None
 
 @app.post("/retrain")
-def retrain_model(req: TrainingRequest):
-    """Retrain the Nigeria flood prediction model"""
+async def retrain_model(req: TrainingRequest):
+    """Start retraining the Nigeria flood prediction model in the background"""
+    global _retrain_active
     try:
         # Update training config
         config = TrainingConfig(
@@ -182,51 +579,90 @@ def retrain_model(req: TrainingRequest):
             max_depth=6
         )
         
-        # Update pipeline config
-        nigeria_ml_pipeline.config = config
-        
-        results = nigeria_ml_pipeline.train_model(
-            use_real_data=req.use_real_data,
-            state_codes=req.state_codes,
-            days_back=req.days_back
-        )
-        return {
-            "status": "success",
-            "message": "Nigeria model retrained successfully",
-            "results": results,
-            "data_source": "Real weather data" if req.use_real_data else "Synthetic data",
-            "states_trained": req.state_codes or "All Nigeria states"
-        }
+        with _retrain_lock:
+            if _retrain_active is not None:
+                return {
+                    "status": "error",
+                    "message": "A retraining job is already running",
+                    "job_id": _retrain_active
+                }
+            
+            # Fit in a separate process so serving keeps its CPU and event loop
+            future = _retrain_executor.submit(
+                train_pipeline,
+                config,
+                use_real_data=req.use_real_data,
+                state_codes=req.state_codes,
+                days_back=req.days_back
+            )
+            job_id = uuid.uuid4().hex
+            _retrain_active = job_id
+            _retrain_jobs[job_id] = {
+                "future": future,
+                "submitted_at": datetime.now().isoformat(),
+                "data_source": "Real weather data" if req.use_real_data else "Synthetic data",
+                "states_trained": req.state_codes or "All Nigeria states"
+            }
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda f: _finish_retrain(config, loop, f))
+        return ORJSONResponse({
+            "status": "accepted",
+            "message": "Nigeria model retraining started",
+            "job_id": job_id
+        }, status_code=202)
     except Exception as e:
         return {
             "status": "error",
             "message": f"Failed to retrain Nigeria model: {str(e)}"
         }
 
+@app.get("/retrain/{job_id}")
+async def retrain_status(job_id: str):
+    """Get the status of a Nigeria model retraining job"""
+    job = _retrain_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Retraining job {job_id} not found")
+    
+    future = job["future"]
+    response = {
+        "job_id": job_id,
+        "submitted_at": job["submitted_at"],
+        "data_source": job["data_source"],
+        "states_trained": job["states_trained"]
+    }
+    if not future.done():
+        response["status"] = "running" if future.running() else "pending"
+    elif future.exception() is not None:
+        response["status"] = "error"
+        response["message"] = f"Failed to retrain Nigeria model: {str(future.exception())}"
+    else:
+        response["status"] = "success"
+        response["message"] = "Nigeria model retrained successfully"
+        response["results"] = future.result()
+    return response
+
 @app.get("/model/info")
-def model_info():
+async def model_info():
     """Get information about the current Nigeria model"""
-    return {
-        "is_trained": nigeria_ml_pipeline.is_trained,
-        "model_type": "Nigeria GradientBoostingRegressor" if nigeria_ml_pipeline.is_trained else "Simple",
-        "features": nigeria_ml_pipeline.feature_columns,
-        "model_path": nigeria_ml_pipeline.model_path,
-        "nigeria_states_count": len(nigeria_ml_pipeline.nigeria_states),
-        "supported_states": list(nigeria_ml_pipeline.nigeria_states.keys())
-    }
+    return Response(_model_info_body(nigeria_ml_pipeline.is_trained), media_type="application/json")
 
 @app.get("/dataset/generate")
 def generate_dataset(n_samples: int = 1000):
     """Generate a sample Nigeria dataset for training"""
     try:
         df = nigeria_ml_pipeline.generate_nigeria_synthetic_dataset(n_samples)
+        columns = df.columns.tolist()
+        
+        # Preview records zipped from column lists, skipping pandas' row-wise to_dict
+        sample = df.head()
+        sample_rows = zip(*(sample[column].tolist() for column in columns))
         return {
             "status": "success",
             "samples": len(df),
-            "columns": list(df.columns),
+            "columns": columns,
             "states_included": df['state_code'].nunique(),
             "regions_included": df['region'].nunique(),
-            "sample_data": df.head().to_dict('records')
+            "sample_data": [dict(zip(columns, row)) for row in sample_rows]
         }
     except Exception as e:
         return {
@@ -235,12 +671,14 @@ def generate_dataset(n_samples: int = 1000):
         }
 
 @app.post("/weather/ingest")
-def ingest_weather_data(req: WeatherIngestRequest):
+async def ingest_weather_data(req: WeatherIngestRequest):
     """Ingest weather data from Open-Meteo API for Nigeria states"""
     try:
         if req.state_code:
-            # Ingest for specific state
-            result = nigeria_weather_ingestion.ingest_state_weather(req.state_code)
+            # Ingest for specific state over the shared session, freeing the worker while waiting
+            result = await nigeria_weather_ingestion.ingest_state_weather_async(
+                app.state.http_session, req.state_code
+            )
             return {
                 "status": "success",
                 "message": f"Weather data ingested successfully for {req.state_code}",
@@ -264,7 +702,9 @@ def ingest_weather_data(req: WeatherIngestRequest):
             }
         elif req.latitude and req.longitude:
             # Ingest for specific coordinates
-            result = nigeria_weather_service.get_current_weather(req.latitude, req.longitude)
+            result = await nigeria_weather_service.get_current_weather_async(
+                app.state.http_session, req.latitude, req.longitude, refresh=True
+            )
             return {
                 "status": "success",
                 "message": "Weather data ingested successfully for coordinates",
@@ -281,8 +721,8 @@ def ingest_weather_data(req: WeatherIngestRequest):
                 }
             }
         else:
-            # Ingest for all states
-            results = nigeria_weather_ingestion.ingest_all_states_weather()
+            # Ingest for all states: one batched request over the shared session, then a bulk insert
+            results = await nigeria_weather_ingestion.ingest_all_states_weather_async(app.state.http_session)
             return {
                 "status": "success",
                 "message": f"Weather data ingested successfully for {len(results)} states",
@@ -296,8 +736,19 @@ def ingest_weather_data(req: WeatherIngestRequest):
             "message": f"Failed to ingest weather data: {str(e)}"
         }
 
+def _training_data_stream(rows: List[Dict[str, Any]], metadata: Dict[str, Any]) -> Iterator[bytes]:
+    """Encode a training-data response incrementally: status, then rows in chunks, then metadata"""
+    yield b'{"status":"success","data":['
+    for start in range(0, len(rows), STREAM_CHUNK_ROWS):
+        chunk = b','.join(
+            orjson.dumps(row, option=orjson.OPT_SERIALIZE_NUMPY)
+            for row in rows[start:start + STREAM_CHUNK_ROWS]
+        )
+        yield b',' + chunk if start else chunk
+    yield b'],' + orjson.dumps(metadata)[1:]
+
 @app.get("/weather/training-data")
-def get_weather_training_data(state_codes: str = None, days_back: int = 30):
+async def get_weather_training_data(state_codes: str = None, days_back: int = 30):
     """Get weather data from database for training Nigeria models"""
     try:
         # Parse state codes if provided
@@ -305,15 +756,18 @@ def get_weather_training_data(state_codes: str = None, days_back: int = 30):
         if state_codes:
             state_list = [code.strip().upper() for code in state_codes.split(',')]
         
-        training_data = get_nigeria_weather_training_data(state_list, days_back)
+        training_data = await get_nigeria_weather_training_data_async(state_list, days_back)
         
-        return {
-            "status": "success",
-            "data": training_data,
-            "count": len(training_data),
-            "states_requested": state_list or "All Nigeria states",
-            "days_back": days_back
-        }
+        # Stream the same JSON document a chunk of rows at a time, skipping FastAPI's
+        # jsonable_encoder walk and never holding the whole encoded body in memory
+        return StreamingResponse(
+            _training_data_stream(training_data, {
+                "count": len(training_data),
+                "states_requested": state_list or "All Nigeria states",
+                "days_back": days_back
+            }),
+            media_type="application/json"
+        )
         
     except Exception as e:
         return {
@@ -337,36 +791,26 @@ def process_sensor_data(sensor_data: dict):
         print(f"Processing sensor data: {sensor_id} ({sensor_type}) = {value}")
         
         # For critical sensors, trigger immediate flood risk assessment
-        if sensor_type in ['RAIN', 'RIVER', 'WATER_LEVEL'] and value is not None:
-            # Get current conditions from database if available
-            current_conditions = {
-                'rainfall_24h': 0,  # Will be updated from database
-                'rainfall_7d': 0,
-                'river_level': 2.0,
-                'soil_moisture': 0.5,
-                'temperature': 25,
-                'humidity': 65,
-                'pressure': 1013,
-                'wind_speed': 3,
-                'wind_direction': 180
-            }
-            
-            # Update conditions based on sensor type
-            if sensor_type == 'RAIN':
-                current_conditions['rainfall_24h'] = value
-            elif sensor_type == 'RIVER':
-                current_conditions['river_level'] = value
-            elif sensor_type == 'WATER_LEVEL':
-                current_conditions['river_level'] = value * 2  # Convert to river level estimate
-            
-            # Get quick flood risk assessment
-            prediction = calculate_flood_risk([1, 6, 24], current_conditions)
-            
-            # Log high-risk situations
-            max_risk = max(prediction.risk)
-            if max_risk > 0.6:
-                print(f"⚠️ HIGH FLOOD RISK DETECTED: {max_risk:.2f} for sensor {sensor_id}")
-                print(f"Recommendations: {prediction.recommendations[:2]}")
+        if sensor_type in CRITICAL_SENSOR_TYPES and value is not None:
+            # Skip the assessment while the reading has not materially changed
+            with _sensor_last_lock:
+                last = _sensor_last_values.get(sensor_id)
+            if last is None or abs(value - last) >= SENSOR_CHANGE_THRESHOLDS[sensor_type]:
+                # Default conditions with the sensor's reading applied, built in one step; the
+                # result is complete, so the assessment uses it without another copy
+                condition, scale = SENSOR_CONDITION_UPDATES[sensor_type]
+                current_conditions = {**SENSOR_DEFAULT_CONDITIONS, condition: value * scale}
+                
+                # Get quick flood risk assessment
+                prediction = calculate_nigeria_flood_risk(SENSOR_ASSESSMENT_HORIZONS, current_conditions)
+                with _sensor_last_lock:
+                    _sensor_last_values[sensor_id] = value
+                
+                # Log high-risk situations
+                max_risk = max(prediction.risk)
+                if max_risk > 0.6:
+                    print(f"⚠️ HIGH FLOOD RISK DETECTED: {max_risk:.2f} for sensor {sensor_id}")
+                    print(f"Recommendations: {prediction.recommendations[:2]}")
         
         return {
             "status": "success",
@@ -383,22 +827,75 @@ def process_sensor_data(sensor_data: dict):
             "message": f"Failed to process sensor data: {str(e)}"
         }
 
+@app.post("/process-sensor-data/batch")
+def process_sensor_data_batch(records: List[SensorRecord]):
+    """Process a batch of sensor readings with one vectorized flood risk assessment"""
+    try:
+        types = np.array([record.type for record in records], dtype=object)
+        values = np.array([np.nan if record.value is None else record.value for record in records], dtype=np.float64)
+        critical = np.isin(types, list(CRITICAL_SENSOR_TYPES)) & ~np.isnan(values)
+        n_critical = int(critical.sum())
+        
+        # Log the incoming batch
+        print(f"Processing {len(records)} sensor readings ({n_critical} critical)")
+        
+        results = []
+        if n_critical:
+            critical_types = types[critical]
+            critical_values = values[critical]
+            
+            # Default conditions for every critical sensor, updated based on sensor type
+            conditions = pd.DataFrame({
+                key: np.full(n_critical, default, dtype=np.float64)
+                for key, default in SENSOR_DEFAULT_CONDITIONS.items()
+            })
+            for sensor_type, (condition, scale) in SENSOR_CONDITION_UPDATES.items():
+                conditions[condition] = np.where(
+                    critical_types == sensor_type, critical_values * scale, conditions[condition]
+                )
+            
+            # One model call for the whole batch, then the /predict horizon kernel per sensor (float32)
+            base_risk = nigeria_ml_pipeline.predict_flood_risk_batch(conditions)['flood_risk'].to_numpy(dtype=np.float32)
+            hours = np.asarray(SENSOR_ASSESSMENT_HORIZONS, dtype=np.float32)
+            rainfall_upper = FORECAST_RAINFALL_UPPER[np.searchsorted(FORECAST_HORIZON_EDGES, hours)]
+            forecast_rainfall = _rng.uniform(0, rainfall_upper, size=(n_critical, hours.size)).astype(np.float32)
+            max_risk = _max_horizon_risk_kernel(hours, forecast_rainfall, base_risk).astype(np.float64)
+            
+            sensor_ids = [record.sensor_id for record, is_critical in zip(records, critical) if is_critical]
+            for sensor_id, sensor_type, value, risk in zip(
+                sensor_ids, critical_types.tolist(), critical_values.tolist(), max_risk.round(3).tolist()
+            ):
+                # Log high-risk situations
+                if risk > 0.6:
+                    print(f"⚠️ HIGH FLOOD RISK DETECTED: {risk:.2f} for sensor {sensor_id}")
+                results.append({"sensor_id": sensor_id, "type": sensor_type, "value": value, "max_risk": risk})
+        
+        return {
+            "status": "success",
+            "message": f"Processed {len(records)} sensor readings",
+            "processed": len(records),
+            "assessed": results
+        }
+        
+    except Exception as e:
+        print(f"Error processing sensor data batch: {e}")
+        return {
+            "status": "error",
+            "message": f"Failed to process sensor data batch: {str(e)}"
+        }
+
 # New Nigeria-specific endpoints
 @app.get("/nigeria/states")
-def get_nigeria_states():
+async def get_nigeria_states():
     """Get list of all Nigeria states with their information"""
-    return {
-        "status": "success",
-        "states": nigeria_ml_pipeline.nigeria_states,
-        "total_states": len(nigeria_ml_pipeline.nigeria_states)
-    }
+    return Response(STATES_BODY, media_type="application/json")
 
 @app.get("/nigeria/states/{state_code}/weather")
-def get_state_weather(state_code: str):
+async def get_state_weather(state_code: str):
     """Get current weather data for a specific Nigeria state"""
     try:
-        weather_data = get_nigeria_state_weather(state_code.upper())
-        return {
+        weather_data = await get_nigeria_state_weather_async(app.state.http_session, state_code.upper())
+        return ORJSONResponse({
             "status": "success",
             "state_code": weather_data.state_code,
             "region": weather_data.region,
@@ -415,16 +912,18 @@ def get_state_weather(state_code: str):
                 "river_level": weather_data.river_level,
                 "timestamp": weather_data.timestamp.isoformat()
             }
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to get weather for {state_code}: {str(e)}")
 
 @app.get("/nigeria/states/{state_code}/forecast")
-def get_state_forecast(state_code: str, days: int = 7):
+async def get_state_forecast(state_code: str, days: int = 7):
     """Get weather forecast for a specific Nigeria state"""
     try:
-        forecast_data = get_nigeria_weather_forecast(state_code.upper(), days)
-        return {
+        forecast_data = await get_nigeria_weather_forecast_async(app.state.http_session, state_code.upper(), days)
+        
+        # Returning the response directly skips FastAPI's jsonable_encoder walk over every day
+        return ORJSONResponse({
             "status": "success",
             "state_code": state_code.upper(),
             "forecast_days": days,
@@ -441,54 +940,29 @@ def get_state_forecast(state_code: str, days: int = 7):
                 }
                 for f in forecast_data
             ]
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to get forecast for {state_code}: {str(e)}")
 
 @app.get("/nigeria/regions")
-def get_nigeria_regions():
+async def get_nigeria_regions():
     """Get Nigeria regions with their states"""
-    regions = {}
-    for state_code, state_info in nigeria_ml_pipeline.nigeria_states.items():
-        region = state_info['region']
-        if region not in regions:
-            regions[region] = []
-        regions[region].append({
-            "code": state_code,
-            "name": state_info['name'],
-            "flood_risk": state_info['flood_risk']
-        })
-    
-    return {
-        "status": "success",
-        "regions": regions,
-        "total_regions": len(regions)
-    }
+    return Response(REGIONS_BODY, media_type="application/json")
 
 @app.get("/")
-def root():
+async def root():
     """Root endpoint with API information"""
-    return {
-        "name": "Nigeria SDSS Flood Prediction API",
-        "version": "3.0.0",
-        "description": "Enhanced flood prediction system for Nigeria states using Open-Meteo weather data and ML models",
-        "model_status": "Trained" if nigeria_ml_pipeline.is_trained else "Not Trained",
-        "nigeria_states_supported": len(nigeria_ml_pipeline.nigeria_states),
-        "endpoints": {
-            "POST /predict": "Get flood risk predictions for Nigeria states",
-            "GET /health": "Health check",
-            "POST /retrain": "Retrain the Nigeria ML model",
-            "GET /model/info": "Get Nigeria model information",
-            "GET /dataset/generate": "Generate Nigeria sample dataset",
-            "POST /weather/ingest": "Ingest weather data for Nigeria states",
-            "GET /weather/training-data": "Get weather data for training",
-            "GET /nigeria/states": "Get all Nigeria states information",
-            "GET /nigeria/states/{state_code}/weather": "Get current weather for a state",
-            "GET /nigeria/states/{state_code}/forecast": "Get weather forecast for a state",
-            "GET /nigeria/regions": "Get Nigeria regions and their states",
-            "GET /": "API information"
-        }
-    }
+    return Response(_root_body(nigeria_ml_pipeline.status_name), media_type="application/json")
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8200)
+    # Workers are separate processes with their own model copy and retrain job table, so
+    # /retrain is only coherent with one worker; raise API_WORKERS only if /retrain is unused
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8200,
+        workers=int(os.getenv('API_WORKERS', '1')),
+        loop="auto",  # uvloop when installed (uvicorn[standard])
+        http="auto",  # httptools when installed
+        access_log=os.getenv('API_ACCESS_LOG') == '1'  # A log line per request costs more than most handlers
+    )
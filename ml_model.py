@@ -3,26 +3,231 @@ Enhanced Flood Prediction ML Model with Real Data Processing
 """
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.preprocessing import StandardScaler
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+from sklearn.inspection import permutation_importance
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score
-import joblib
+from joblib import Parallel, delayed
 import os
-from datetime import datetime, timedelta
+import copy
+from datetime import datetime, timedelta, timezone
 import json
-from typing import Dict, List, Tuple, Any
+from typing import Dict, Iterator, List, Optional, Tuple, Any
+from bisect import bisect_left
 import requests
 from supabase import create_client, Client
 
+from lib.model_store import artifact_lock, dump_artifact, load_artifact, remove_artifact
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; kernels run as plain Python without it
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# Directory holding the saved model, scaler and metadata.json
+MODEL_PATH = "models/"
+
+# Samples per synthetic-data shard; larger datasets are generated in parallel
+SYNTHETIC_SHARD_SIZE = 100_000
+
+# Boosting rounds added per incremental training run on top of the saved model
+INCREMENTAL_BOOSTING_ROUNDS = 20
+
+# Readings from before the last training fetched with an incremental delta, so the
+# 7-reading rainfall window of the first new rows is complete (hourly readings need 6)
+INCREMENTAL_CONTEXT = timedelta(days=1)
+
+# Model input features, in the column order the model is trained on
+FEATURE_COLUMNS = (
+    'temperature', 'humidity', 'pressure', 'rainfall_24h', 'rainfall_7d',
+    'river_level', 'soil_moisture', 'wind_speed', 'wind_direction', 'day_of_year'
+)
+
+# Flood level buckets: a risk strictly above a threshold moves to the next level
+RISK_THRESHOLDS = (0.4, 0.6, 0.8)
+FLOOD_LEVELS = ('INFO', 'WATCH', 'WARNING', 'EMERGENCY')
+FLOOD_LEVEL_ARRAY = np.array(FLOOD_LEVELS)
+
+# Level-specific recommendations, indexed like FLOOD_LEVELS
+LEVEL_RECOMMENDATIONS = (
+    ("INFO: Normal conditions expected",),
+    ("WATCH: Monitor conditions closely", "Prepare emergency supplies"),
+    ("WARNING: Prepare for potential flooding", "Monitor river levels closely"),
+    ("EMERGENCY: Evacuate low-lying areas immediately", "Activate emergency response protocols")
+)
+
+# Defaults for features missing from request conditions (day_of_year comes from the clock)
+FEATURE_DEFAULTS = {
+    'temperature': 25,
+    'humidity': 65,
+    'pressure': 1013,
+    'rainfall_24h': 0,
+    'rainfall_7d': 0,
+    'river_level': 2.0,
+    'soil_moisture': 0.5,
+    'wind_speed': 3,
+    'wind_direction': 180
+}
+
+# Synthetic dataset columns and their storage dtypes, in output order
+SYNTHETIC_COLUMN_DTYPES = {
+    'temperature': np.float32,
+    'humidity': np.float32,
+    'pressure': np.float32,
+    'rainfall_24h': np.float32,
+    'rainfall_7d': np.float32,
+    'river_level': np.float32,
+    'soil_moisture': np.float32,
+    'wind_speed': np.float32,
+    'wind_direction': np.float32,
+    'day_of_year': np.int16,
+    'flood_risk': np.float32
+}
+
+@njit('f8(f8, f8, f8, f8)', cache=True, fastmath=True)
+def _risk_kernel(rainfall_24h, river_level, soil_moisture, temperature):
+    """Weighted fallback flood risk score, clipped to 0-1"""
+    risk = (
+        0.4 * min(1.0, rainfall_24h / 50) +
+        0.3 * min(1.0, max(0.0, river_level - 2) / 3) +
+        0.2 * soil_moisture +
+        0.1 * max(0.0, (temperature - 25) / 10)
+    )
+    return max(0.0, min(1.0, risk))
+
+def _weighted_flood_risk(rainfall_24h, river_level, soil_moisture, temperature, humidity):
+    """Weighted flood risk from the conditions driving it (unclipped)"""
+    return (
+        0.4 * np.minimum(1.0, rainfall_24h / 50) +  # Normalize to 0-1
+        0.3 * np.minimum(1.0, np.maximum(0, river_level - 2) / 3) +  # River above 2m
+        0.15 * soil_moisture +
+        0.1 * np.maximum(0, (temperature - 30) / 10) +  # High temp = more evaporation
+        0.05 * (humidity / 100)
+    )
+
+@njit('f8[:](f8[:], i8)', cache=True)
+def _rolling_sum(values, window):
+    """Trailing sum over window samples that skips NaNs, like pandas rolling(min_periods=1).sum()"""
+    # No fastmath here: it would let LLVM assume the NaN checks never fire
+    out = np.empty_like(values)
+    total = 0.0
+    count = 0
+    for i in range(len(values)):
+        if not np.isnan(values[i]):
+            total += values[i]
+            count += 1
+        if i >= window and not np.isnan(values[i - window]):
+            total -= values[i - window]
+            count -= 1
+        out[i] = total if count > 0 else np.nan
+    return out
+
+def _fill_synthetic_shard(seed: np.random.SeedSequence, out: Dict[str, np.ndarray]):
+    """Generate one shard of synthetic samples into preallocated column slices"""
+    rng = np.random.default_rng(seed)
+    n_samples = len(out['flood_risk'])
+    
+    # Base environmental factors
+    temperature = rng.normal(25, 8, n_samples)  # 25°C ± 8°C
+    humidity = rng.normal(65, 20, n_samples)    # 65% ± 20%
+    pressure = rng.normal(1013, 20, n_samples)  # 1013 hPa ± 20
+    
+    # Seasonal patterns
+    day_of_year = rng.integers(1, 365, n_samples)
+    seasonal_factor = 1 + 0.3 * np.sin(2 * np.pi * day_of_year / 365)
+    
+    # Historical rainfall (last 7 days)
+    rainfall_7d = rng.exponential(2, n_samples) * seasonal_factor
+    rainfall_24h = rng.exponential(1, n_samples) * seasonal_factor
+    
+    # River level (depends on rainfall and other factors)
+    base_river_level = 2.0
+    river_level = base_river_level + (rainfall_7d * 0.1) + rng.normal(0, 0.3, n_samples)
+    
+    # Soil moisture (depends on rainfall and temperature), clipped in its own buffer
+    soil_moisture = 0.3 + (rainfall_7d * 0.05) - (temperature - 25) * 0.01
+    np.clip(soil_moisture, 0.0, 1.0, out=soil_moisture)
+    
+    # Wind speed and direction
+    wind_speed = rng.exponential(3, n_samples)
+    wind_direction = rng.uniform(0, 360, n_samples)
+    
+    # Weighted flood risk calculation based on multiple factors
+    flood_risk = _weighted_flood_risk(rainfall_24h, river_level, soil_moisture, temperature, humidity)
+    
+    # Add some noise and ensure 0-1 range, written straight into the output column
+    np.add(flood_risk, rng.normal(0, 0.1, n_samples), out=out['flood_risk'])
+    np.clip(out['flood_risk'], 0.0, 1.0, out=out['flood_risk'])
+    
+    out['temperature'][:] = temperature
+    out['humidity'][:] = humidity
+    out['pressure'][:] = pressure
+    out['rainfall_24h'][:] = rainfall_24h
+    out['rainfall_7d'][:] = rainfall_7d
+    out['river_level'][:] = river_level
+    out['soil_moisture'][:] = soil_moisture
+    out['wind_speed'][:] = wind_speed
+    out['wind_direction'][:] = wind_direction
+    out['day_of_year'][:] = day_of_year
+    
+    # Drawn last, so skipping it leaves every other column unchanged
+    if 'days_ago' in out:
+        out['days_ago'][:] = rng.integers(0, 365, n_samples)
+
+def _synthetic_shard_plan(n_samples: int) -> Tuple[List[np.random.SeedSequence], List[int]]:
+    """Seeds and sizes of the fixed-size shards that make up a synthetic dataset"""
+    n_shards = max(1, -(-n_samples // SYNTHETIC_SHARD_SIZE))
+    shard_sizes = [min(SYNTHETIC_SHARD_SIZE, n_samples - i * SYNTHETIC_SHARD_SIZE) for i in range(n_shards)]
+    return np.random.SeedSequence(42).spawn(n_shards), shard_sizes
+
+def _allocate_synthetic_columns(n_samples: int, include_timestamps: bool) -> Dict[str, np.ndarray]:
+    """Uninitialized synthetic dataset columns (plus day offsets when timestamps are wanted)"""
+    column_dtypes = dict(SYNTHETIC_COLUMN_DTYPES)
+    if include_timestamps:
+        column_dtypes['days_ago'] = np.int16
+    return {column: np.empty(n_samples, dtype=dtype) for column, dtype in column_dtypes.items()}
+
+def _synthetic_frame(data: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """Assemble filled synthetic columns into the dataset frame"""
+    flood_risk = data['flood_risk']
+    
+    # Determine flood level
+    flood_level = FLOOD_LEVEL_ARRAY[np.searchsorted(RISK_THRESHOLDS, flood_risk)]
+    
+    df = pd.DataFrame({
+        'temperature': data['temperature'],
+        'humidity': data['humidity'],
+        'pressure': data['pressure'],
+        'rainfall_24h': data['rainfall_24h'],
+        'rainfall_7d': data['rainfall_7d'],
+        'river_level': data['river_level'],
+        'soil_moisture': data['soil_moisture'],
+        'wind_speed': data['wind_speed'],
+        'wind_direction': data['wind_direction'],
+        'day_of_year': data['day_of_year'],
+        'flood_risk': flood_risk,
+        'flood_level': flood_level
+    })
+    
+    # Timestamps are unused for training, so only exports pay for the column
+    if 'days_ago' in data:
+        df['timestamp'] = np.datetime64(datetime.now(), 'us') - data['days_ago'].astype('timedelta64[D]')
+    
+    return df
+
 class FloodPredictionModel:
-    def __init__(self):
+    def __init__(self, autosave: bool = True):
         self.rainfall_model = None
         self.river_level_model = None
         self.flood_risk_model = None
-        self.scaler = StandardScaler()
+        self.scaler = None  # Only set for legacy models trained on standardized features
         self.is_trained = False
-        self.model_path = "models/"
+        self.full_refit_at = None  # Last time the model was fit from scratch rather than boosted
+        self.model_path = MODEL_PATH
+        self.autosave = autosave  # Save after every training run; interactive tools save explicitly
         
         # Initialize Supabase client for real data
         self.supabase = None
@@ -49,88 +254,38 @@ class FloodPredictionModel:
             print(f"⚠️ Failed to initialize Supabase: {e}")
             self.supabase = None
     
-    def generate_synthetic_dataset(self, n_samples: int = 10000) -> pd.DataFrame:
-        """Generate synthetic but realistic flood prediction dataset"""
-        np.random.seed(42)
-        
-        data = []
-        for i in range(n_samples):
-            # Base environmental factors
-            temperature = np.random.normal(25, 8)  # 25°C ± 8°C
-            humidity = np.random.normal(65, 20)    # 65% ± 20%
-            pressure = np.random.normal(1013, 20)  # 1013 hPa ± 20
-            
-            # Seasonal patterns
-            day_of_year = np.random.randint(1, 365)
-            seasonal_factor = 1 + 0.3 * np.sin(2 * np.pi * day_of_year / 365)
-            
-            # Historical rainfall (last 7 days)
-            rainfall_7d = np.random.exponential(2) * seasonal_factor
-            rainfall_24h = np.random.exponential(1) * seasonal_factor
-            
-            # River level (depends on rainfall and other factors)
-            base_river_level = 2.0
-            river_level = base_river_level + (rainfall_7d * 0.1) + np.random.normal(0, 0.3)
-            
-            # Soil moisture (depends on rainfall and temperature)
-            soil_moisture = min(1.0, max(0.0, 0.3 + (rainfall_7d * 0.05) - (temperature - 25) * 0.01))
-            
-            # Wind speed and direction
-            wind_speed = np.random.exponential(3)
-            wind_direction = np.random.uniform(0, 360)
-            
-            # Calculate flood risk based on multiple factors
-            risk_factors = {
-                'rainfall_factor': min(1.0, rainfall_24h / 50),  # Normalize to 0-1
-                'river_factor': min(1.0, max(0, river_level - 2) / 3),  # River above 2m
-                'soil_factor': soil_moisture,
-                'temperature_factor': max(0, (temperature - 30) / 10),  # High temp = more evaporation
-                'humidity_factor': humidity / 100,
-                'pressure_factor': abs(pressure - 1013) / 50,  # Pressure anomalies
-            }
-            
-            # Weighted flood risk calculation
-            flood_risk = (
-                0.4 * risk_factors['rainfall_factor'] +
-                0.3 * risk_factors['river_factor'] +
-                0.15 * risk_factors['soil_factor'] +
-                0.1 * risk_factors['temperature_factor'] +
-                0.05 * risk_factors['humidity_factor']
+    def generate_synthetic_dataset(self, n_samples: int = 10000, include_timestamps: bool = False) -> pd.DataFrame:
+        """Generate synthetic but realistic flood prediction dataset (timestamps only for exports)"""
+        # Fixed-size shards with spawned seeds keep the output identical however many cores run them;
+        # threads suffice since the NumPy kernels release the GIL
+        seeds, shard_sizes = _synthetic_shard_plan(n_samples)
+        
+        # Preallocate contiguous columns; each shard fills its own slice, so nothing is concatenated
+        data = _allocate_synthetic_columns(n_samples, include_timestamps)
+        shard_views = [
+            {column: values[i * SYNTHETIC_SHARD_SIZE:i * SYNTHETIC_SHARD_SIZE + size] for column, values in data.items()}
+            for i, size in enumerate(shard_sizes)
+        ]
+        if len(seeds) == 1:
+            _fill_synthetic_shard(seeds[0], shard_views[0])
+        else:
+            Parallel(n_jobs=min(len(seeds), os.cpu_count() or 1), prefer='threads')(
+                delayed(_fill_synthetic_shard)(seed, out) for seed, out in zip(seeds, shard_views)
             )
-            
-            # Add some noise and ensure 0-1 range
-            flood_risk = min(1.0, max(0.0, flood_risk + np.random.normal(0, 0.1)))
-            
-            # Determine flood level
-            if flood_risk > 0.8:
-                flood_level = "EMERGENCY"
-            elif flood_risk > 0.6:
-                flood_level = "WARNING"
-            elif flood_risk > 0.4:
-                flood_level = "WATCH"
-            else:
-                flood_level = "INFO"
-            
-            data.append({
-                'temperature': temperature,
-                'humidity': humidity,
-                'pressure': pressure,
-                'rainfall_24h': rainfall_24h,
-                'rainfall_7d': rainfall_7d,
-                'river_level': river_level,
-                'soil_moisture': soil_moisture,
-                'wind_speed': wind_speed,
-                'wind_direction': wind_direction,
-                'day_of_year': day_of_year,
-                'flood_risk': flood_risk,
-                'flood_level': flood_level,
-                'timestamp': datetime.now() - timedelta(days=np.random.randint(0, 365))
-            })
         
-        return pd.DataFrame(data)
+        return _synthetic_frame(data)
+    
+    def iter_synthetic_dataset(self, n_samples: int = 10000,
+                               include_timestamps: bool = False) -> Iterator[pd.DataFrame]:
+        """Yield the synthetic dataset one shard at a time (same rows as generate_synthetic_dataset)"""
+        seeds, shard_sizes = _synthetic_shard_plan(n_samples)
+        for seed, size in zip(seeds, shard_sizes):
+            data = _allocate_synthetic_columns(size, include_timestamps)
+            _fill_synthetic_shard(seed, data)
+            yield _synthetic_frame(data)
     
     def fetch_real_weather_data(self, latitude: float = None, longitude: float = None, 
-                               days_back: int = 30) -> pd.DataFrame:
+                               days_back: int = 30, since: datetime = None) -> pd.DataFrame:
         """Fetch real weather data from database for training"""
         if not self.supabase:
             print("⚠️ No database connection, falling back to synthetic data")
@@ -142,7 +297,7 @@ class FloodPredictionModel:
                 latitude, longitude = 52.52, 13.41  # Berlin coordinates
             
             # Calculate date range
-            end_date = datetime.now()
+            end_date = datetime.now(timezone.utc)
             start_date = end_date - timedelta(days=days_back)
             
             # Get weather sensor types
@@ -198,21 +353,11 @@ class FloodPredictionModel:
                     elif sensor_type == 'RAIN':
                         grouped_data[ts]['precipitation'] = reading['value']
             
-            # Convert to DataFrame
-            weather_df = pd.DataFrame(list(grouped_data.values()))
-            
-            if weather_df.empty:
+            if not grouped_data:
                 print("⚠️ No valid weather data found")
                 return self.generate_synthetic_dataset()
             
-            # Convert timestamp to datetime
-            weather_df['timestamp'] = pd.to_datetime(weather_df['timestamp'])
-            
-            # Calculate derived features
-            weather_df = self._calculate_derived_features(weather_df)
-            
-            # Fill missing values with reasonable defaults
-            weather_df = self._fill_missing_weather_data(weather_df)
+            weather_df = self.build_weather_frame(list(grouped_data.values()), since=since)
             
             print(f"✅ Fetched {len(weather_df)} real weather records from database")
             return weather_df
@@ -221,6 +366,32 @@ class FloodPredictionModel:
             print(f"⚠️ Error fetching real weather data: {e}")
             return self.generate_synthetic_dataset()
     
+    def build_weather_frame(self, records: List[Dict[str, Any]], since: datetime = None) -> pd.DataFrame:
+        """Build a labelled training frame from weather records (one dict per timestamp, as stored readings are grouped)"""
+        # Convert to DataFrame
+        weather_df = pd.DataFrame(records)
+        
+        # Convert timestamp to datetime, in order so rolling windows see the preceding readings
+        weather_df['timestamp'] = pd.to_datetime(weather_df['timestamp'], utc=True)
+        weather_df = weather_df.sort_values('timestamp', ignore_index=True)
+        
+        # Calculate derived features
+        weather_df = self._calculate_derived_features(weather_df)
+        
+        # Fill missing values with reasonable defaults
+        weather_df = self._fill_missing_weather_data(weather_df)
+        
+        # Label readings with the same weighted risk the synthetic data uses
+        features = {col: weather_df[col].fillna(FEATURE_DEFAULTS[col]) for col in
+                    ('rainfall_24h', 'river_level', 'soil_moisture', 'temperature', 'humidity')}
+        weather_df['flood_risk'] = np.clip(_weighted_flood_risk(**features), 0.0, 1.0)
+        
+        # Earlier readings only provide rolling-window context
+        if since is not None:
+            weather_df = weather_df[weather_df['timestamp'] > since].reset_index(drop=True)
+        
+        return weather_df
+    
     def _calculate_derived_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Calculate derived features from weather data"""
         # Add day of year
@@ -228,8 +399,9 @@ class FloodPredictionModel:
         
         # Calculate rainfall accumulation (7-day rolling sum)
         if 'precipitation' in df.columns:
-            df['rainfall_7d'] = df['precipitation'].rolling(window=7, min_periods=1).sum()
-            df['rainfall_24h'] = df['precipitation'].rolling(window=1, min_periods=1).sum()
+            precipitation = df['precipitation'].to_numpy(dtype=np.float64, copy=True)  # Kernel needs a writable array
+            df['rainfall_7d'] = _rolling_sum(precipitation, 7)
+            df['rainfall_24h'] = precipitation  # A one-sample window is the reading itself
         else:
             df['rainfall_7d'] = 0
             df['rainfall_24h'] = 0
@@ -273,27 +445,41 @@ class FloodPredictionModel:
     
     def prepare_features(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
         """Prepare features for training"""
-        feature_columns = [
-            'temperature', 'humidity', 'pressure', 'rainfall_24h', 'rainfall_7d',
-            'river_level', 'soil_moisture', 'wind_speed', 'wind_direction', 'day_of_year'
-        ]
-        
-        X = df[feature_columns].values
-        y = df['flood_risk'].values
+        # Weather scalars carry ~3 significant digits, so float32 halves the matrix for free
+        X = df[list(FEATURE_COLUMNS)].values.astype(np.float32, copy=False)
+        y = df['flood_risk'].values.astype(np.float32, copy=False)
         
         return X, y
     
     def train_models(self, df: pd.DataFrame = None, use_real_data: bool = True, 
-                    latitude: float = None, longitude: float = None, days_back: int = 30):
-        """Train the flood prediction models"""
+                    latitude: float = None, longitude: float = None, days_back: int = 30,
+                    incremental: bool = False):
+        """Train the flood prediction models, or add boosting rounds fit on new data when incremental"""
+        # Warm-starting needs a boosted model on raw features; anything else gets a full refit
+        trained_at = last_trained_at(self.model_path) if incremental else None
+        incremental = (
+            trained_at is not None and self.is_trained and self.scaler is None
+            and isinstance(self.flood_risk_model, HistGradientBoostingRegressor)
+        )
+        
         if df is None:
             if use_real_data and self.supabase:
+                since = None
+                if incremental:
+                    # Only the readings stored since the last training run, plus rainfall context
+                    since = trained_at
+                    days_back = (datetime.now(timezone.utc) - trained_at + INCREMENTAL_CONTEXT) / timedelta(days=1)
                 print("Fetching real weather data from database...")
-                df = self.fetch_real_weather_data(latitude, longitude, days_back)
+                df = self.fetch_real_weather_data(latitude, longitude, days_back, since=since)
             else:
                 print("Generating synthetic dataset...")
                 df = self.generate_synthetic_dataset()
         
+        # Boosting on synthetic data (the fallback when no readings were stored) would only dilute the model
+        if incremental and (df.empty or 'timestamp' not in df.columns):
+            print("No new weather readings since the last training; keeping the saved model")
+            return None
+        
         print(f"Training with {len(df)} samples...")
         print(f"Data source: {'Real weather data' if 'timestamp' in df.columns else 'Synthetic data'}")
         
@@ -305,22 +491,28 @@ class FloodPredictionModel:
             X, y, test_size=0.2, random_state=42
         )
         
-        # Scale features
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
-        
         # Train flood risk model
-        print("Training flood risk model...")
-        self.flood_risk_model = GradientBoostingRegressor(
-            n_estimators=100,
-            learning_rate=0.1,
-            max_depth=6,
-            random_state=42
-        )
-        self.flood_risk_model.fit(X_train_scaled, y_train)
+        if incremental:
+            print(f"Adding {INCREMENTAL_BOOSTING_ROUNDS} boosting rounds to the flood risk model...")
+            # A memory-mapped model is read-only, so boost an in-memory copy
+            self.flood_risk_model = copy.deepcopy(self.flood_risk_model)
+            self.flood_risk_model.set_params(
+                warm_start=True,
+                max_iter=self.flood_risk_model.n_iter_ + INCREMENTAL_BOOSTING_ROUNDS
+            )
+        else:
+            print("Training flood risk model...")
+            self.flood_risk_model = HistGradientBoostingRegressor(
+                max_iter=100,
+                learning_rate=0.1,
+                max_depth=6,
+                random_state=42
+            )
+            self.full_refit_at = datetime.now(timezone.utc)
+        self.flood_risk_model.fit(X_train, y_train)
         
         # Evaluate model
-        y_pred = self.flood_risk_model.predict(X_test_scaled)
+        y_pred = self.flood_risk_model.predict(X_test)
         mse = mean_squared_error(y_test, y_pred)
         r2 = r2_score(y_test, y_pred)
         
@@ -328,130 +520,117 @@ class FloodPredictionModel:
         print(f"  MSE: {mse:.4f}")
         print(f"  R²: {r2:.4f}")
         
+        # Tree ensembles are scale-invariant, so raw features go straight to the model
+        self.scaler = None
         self.is_trained = True
         
         # Save models
-        self.save_models()
+        if self.autosave:
+            self.save_models()
+        
+        # Permutation importance costs 5 extra passes over the test split per feature, so only
+        # full fits report it; the hourly incremental runs leave it out
+        feature_importance = None
+        if not incremental:
+            importance = permutation_importance(
+                self.flood_risk_model, X_test, y_test, n_repeats=5, random_state=42
+            )
+            feature_importance = dict(zip(FEATURE_COLUMNS, importance.importances_mean))
         
         return {
             'mse': mse,
             'r2': r2,
             'n_samples': len(df),
-            'feature_importance': dict(zip([
-                'temperature', 'humidity', 'pressure', 'rainfall_24h', 'rainfall_7d',
-                'river_level', 'soil_moisture', 'wind_speed', 'wind_direction', 'day_of_year'
-            ], self.flood_risk_model.feature_importances_))
+            'feature_importance': feature_importance
         }
     
     def predict_flood_risk(self, conditions: Dict[str, Any]) -> Dict[str, Any]:
         """Predict flood risk for given conditions"""
+        return self.predict_flood_risk_batch([conditions])[0]
+    
+    def predict_flood_risk_batch(self, conditions_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Predict flood risk for many sets of conditions with a single model call"""
         if not self.is_trained:
             # Fallback to simple calculation if model not trained
-            return self._simple_flood_risk(conditions)
+            return [self._simple_flood_risk(conditions) for conditions in conditions_list]
         
-        # Prepare input features
-        features = np.array([[
-            conditions.get('temperature', 25),
-            conditions.get('humidity', 65),
-            conditions.get('pressure', 1013),
-            conditions.get('rainfall_24h', 0),
-            conditions.get('rainfall_7d', 0),
-            conditions.get('river_level', 2.0),
-            conditions.get('soil_moisture', 0.5),
-            conditions.get('wind_speed', 3),
-            conditions.get('wind_direction', 180),
-            datetime.now().timetuple().tm_yday
-        ]])
-        
-        # Scale features
-        features_scaled = self.scaler.transform(features)
-        
-        # Predict flood risk
-        flood_risk = self.flood_risk_model.predict(features_scaled)[0]
-        flood_risk = max(0.0, min(1.0, flood_risk))  # Ensure 0-1 range
-        
-        # Calculate confidence based on feature completeness
-        confidence = 0.8  # Base confidence
-        missing_features = sum(1 for v in conditions.values() if v is None)
-        confidence -= missing_features * 0.1
-        confidence = max(0.3, confidence)
-        
-        # Determine risk level
-        if flood_risk > 0.8:
-            level = "EMERGENCY"
-        elif flood_risk > 0.6:
-            level = "WARNING"
-        elif flood_risk > 0.4:
-            level = "WATCH"
-        else:
-            level = "INFO"
+        if not conditions_list:
+            return []
         
-        # Generate recommendations
-        recommendations = self._generate_recommendations(flood_risk, conditions)
+        # Prepare input features, one row per set of conditions; day_of_year fills the last column
+        default_items = FEATURE_DEFAULTS.items()
+        features = np.empty((len(conditions_list), len(FEATURE_COLUMNS)), dtype=np.float32)
+        features[:, :-1] = [
+            [conditions.get(key, default) for key, default in default_items] for conditions in conditions_list
+        ]
+        features[:, -1] = datetime.now().timetuple().tm_yday
         
-        return {
-            'flood_risk': flood_risk,
-            'confidence': confidence,
-            'level': level,
-            'recommendations': recommendations,
-            'factors': {
-                'rainfall_24h': conditions.get('rainfall_24h', 0),
-                'river_level': conditions.get('river_level', 2.0),
-                'soil_moisture': conditions.get('soil_moisture', 0.5),
-                'temperature': conditions.get('temperature', 25),
-                'humidity': conditions.get('humidity', 65)
-            }
-        }
+        # Calculate confidence based on feature completeness (explicit None values load as NaN)
+        missing_features = np.count_nonzero(np.isnan(features[:, :-1]), axis=1)
+        confidences = np.maximum(0.3, 0.8 - missing_features * 0.1)
+        
+        # Predict flood risk for the whole batch
+        flood_risks = self.predict_flood_risk_from_array(features)
+        
+        # Determine risk levels
+        levels = FLOOD_LEVEL_ARRAY[np.searchsorted(RISK_THRESHOLDS, flood_risks)]
+        
+        results = []
+        for conditions, flood_risk, confidence, level in zip(
+            conditions_list, flood_risks.tolist(), confidences.tolist(), levels.tolist()
+        ):
+            results.append({
+                'flood_risk': flood_risk,
+                'confidence': confidence,
+                'level': level,
+                'recommendations': self._generate_recommendations(flood_risk, conditions),
+                'factors': {
+                    'rainfall_24h': conditions.get('rainfall_24h', 0),
+                    'river_level': conditions.get('river_level', 2.0),
+                    'soil_moisture': conditions.get('soil_moisture', 0.5),
+                    'temperature': conditions.get('temperature', 25),
+                    'humidity': conditions.get('humidity', 65)
+                }
+            })
+        
+        return results
+    
+    def predict_flood_risk_from_array(self, features: np.ndarray) -> np.ndarray:
+        """Predict flood risk for feature rows already in FEATURE_COLUMNS order"""
+        features = np.asarray(features, dtype=np.float32).reshape(-1, len(FEATURE_COLUMNS))
+        
+        if not self.is_trained:
+            # Fallback to simple calculation if model not trained
+            columns = [FEATURE_COLUMNS.index(name) for name in ('rainfall_24h', 'river_level', 'soil_moisture', 'temperature')]
+            return np.array([_risk_kernel(*map(float, row[columns])) for row in features])
+        
+        # Scale features for legacy models trained on standardized input
+        if self.scaler is not None:
+            features = self.scaler.transform(features)
+        
+        return np.clip(self.flood_risk_model.predict(features), 0.0, 1.0)  # Ensure 0-1 range
     
     def _simple_flood_risk(self, conditions: Dict[str, Any]) -> Dict[str, Any]:
         """Simple flood risk calculation as fallback"""
-        rainfall_24h = conditions.get('rainfall_24h', 0)
-        river_level = conditions.get('river_level', 2.0)
-        soil_moisture = conditions.get('soil_moisture', 0.5)
-        temperature = conditions.get('temperature', 25)
-        
-        # Simple weighted calculation
-        risk = (
-            0.4 * min(1.0, rainfall_24h / 50) +
-            0.3 * min(1.0, max(0, river_level - 2) / 3) +
-            0.2 * soil_moisture +
-            0.1 * max(0, (temperature - 25) / 10)
+        # Simple weighted calculation (compiled kernel)
+        risk = _risk_kernel(
+            conditions.get('rainfall_24h', 0),
+            conditions.get('river_level', 2.0),
+            conditions.get('soil_moisture', 0.5),
+            conditions.get('temperature', 25)
         )
         
-        risk = max(0.0, min(1.0, risk))
-        
-        if risk > 0.8:
-            level = "EMERGENCY"
-        elif risk > 0.6:
-            level = "WARNING"
-        elif risk > 0.4:
-            level = "WATCH"
-        else:
-            level = "INFO"
-        
         return {
             'flood_risk': risk,
             'confidence': 0.6,
-            'level': level,
+            'level': FLOOD_LEVELS[bisect_left(RISK_THRESHOLDS, risk)],
             'recommendations': self._generate_recommendations(risk, conditions),
             'factors': conditions
         }
     
     def _generate_recommendations(self, risk: float, conditions: Dict[str, Any]) -> List[str]:
         """Generate recommendations based on risk level and conditions"""
-        recommendations = []
-        
-        if risk > 0.8:
-            recommendations.append("EMERGENCY: Evacuate low-lying areas immediately")
-            recommendations.append("Activate emergency response protocols")
-        elif risk > 0.6:
-            recommendations.append("WARNING: Prepare for potential flooding")
-            recommendations.append("Monitor river levels closely")
-        elif risk > 0.4:
-            recommendations.append("WATCH: Monitor conditions closely")
-            recommendations.append("Prepare emergency supplies")
-        else:
-            recommendations.append("INFO: Normal conditions expected")
+        recommendations = list(LEVEL_RECOMMENDATIONS[bisect_left(RISK_THRESHOLDS, risk)])
         
         # Specific recommendations based on conditions
         if conditions.get('rainfall_24h', 0) > 30:
@@ -466,51 +645,82 @@ class FloodPredictionModel:
         return recommendations
     
     def save_models(self):
-        """Save trained models to disk"""
-        if self.flood_risk_model:
-            joblib.dump(self.flood_risk_model, f"{self.model_path}/flood_risk_model.pkl")
-        if hasattr(self, 'scaler'):
-            joblib.dump(self.scaler, f"{self.model_path}/scaler.pkl")
-        
-        # Save model metadata
-        metadata = {
-            'trained_at': datetime.now().isoformat(),
-            'is_trained': self.is_trained,
-            'model_type': 'GradientBoostingRegressor'
-        }
-        
-        with open(f"{self.model_path}/metadata.json", 'w') as f:
-            json.dump(metadata, f, indent=2)
+        """Save trained models to disk (see lib/model_store.py for the persistence policy)"""
+        with artifact_lock(self.model_path):
+            if self.flood_risk_model:
+                dump_artifact(self.flood_risk_model, f"{self.model_path}/flood_risk_model.pkl")
+            
+            # Drop a stale scaler so it is not applied to the unscaled model on load
+            if self.scaler is None:
+                remove_artifact(f"{self.model_path}/scaler.pkl")
+            
+            # Save model metadata
+            metadata = {
+                'trained_at': datetime.now(timezone.utc).isoformat(),
+                'full_refit_at': self.full_refit_at.isoformat() if self.full_refit_at else None,
+                'is_trained': self.is_trained,
+                'model_type': 'HistGradientBoostingRegressor'
+            }
+            
+            with open(f"{self.model_path}/metadata.json", 'w') as f:
+                json.dump(metadata, f, indent=2)
     
     def load_models(self):
         """Load trained models from disk"""
         try:
-            if os.path.exists(f"{self.model_path}/flood_risk_model.pkl"):
-                self.flood_risk_model = joblib.load(f"{self.model_path}/flood_risk_model.pkl")
-                print("Loaded trained flood risk model")
-            
-            if os.path.exists(f"{self.model_path}/scaler.pkl"):
-                self.scaler = joblib.load(f"{self.model_path}/scaler.pkl")
-                print("Loaded feature scaler")
-            
-            if os.path.exists(f"{self.model_path}/metadata.json"):
-                with open(f"{self.model_path}/metadata.json", 'r') as f:
-                    metadata = json.load(f)
-                    self.is_trained = metadata.get('is_trained', False)
-                    print(f"Model trained at: {metadata.get('trained_at', 'Unknown')}")
+            with artifact_lock(self.model_path, shared=True):
+                if os.path.exists(f"{self.model_path}/flood_risk_model.pkl"):
+                    self.flood_risk_model = load_artifact(f"{self.model_path}/flood_risk_model.pkl")
+                    print("Loaded trained flood risk model")
+                
+                if os.path.exists(f"{self.model_path}/scaler.pkl"):
+                    self.scaler = load_artifact(f"{self.model_path}/scaler.pkl")
+                    print("Loaded legacy feature scaler")
+                
+                if os.path.exists(f"{self.model_path}/metadata.json"):
+                    with open(f"{self.model_path}/metadata.json", 'r') as f:
+                        metadata = json.load(f)
+                        self.is_trained = metadata.get('is_trained', False)
+                        full_refit_at = metadata.get('full_refit_at')
+                        self.full_refit_at = (
+                            datetime.fromisoformat(full_refit_at).astimezone(timezone.utc) if full_refit_at else None
+                        )
+                        print(f"Model trained at: {metadata.get('trained_at', 'Unknown')}")
             
         except Exception as e:
             print(f"Error loading models: {e}")
             self.is_trained = False
 
-# Global model instance
-flood_model = FloodPredictionModel()
+def last_trained_at(model_path: str = MODEL_PATH) -> Optional[datetime]:
+    """When the saved model was last trained (UTC), read from its metadata without loading the model"""
+    try:
+        with open(f"{model_path}/metadata.json", 'r') as f:
+            metadata = json.load(f)
+        if not metadata.get('is_trained'):
+            return None
+        # Older metadata stored naive local time; astimezone reads a naive value as local
+        return datetime.fromisoformat(metadata['trained_at']).astimezone(timezone.utc)
+    except (OSError, KeyError, ValueError):
+        return None
 
-# Train model if not already trained
-if not flood_model.is_trained:
-    print("Training flood prediction model...")
-    training_results = flood_model.train_models()
-    print("Model training completed!")
-    print(f"Training results: {training_results}")
-else:
-    print("Using pre-trained flood prediction model")
+# Global model instance, created on first use so importing the module stays cheap
+_instance = None
+
+def get_model() -> FloodPredictionModel:
+    """Return the shared model instance, loading saved models on first call"""
+    global _instance
+    if _instance is None:
+        _instance = FloodPredictionModel()
+    return _instance
+
+if __name__ == "__main__":
+    flood_model = get_model()
+    
+    # Train model if not already trained
+    if not flood_model.is_trained:
+        print("Training flood prediction model...")
+        training_results = flood_model.train_models()
+        print("Model training completed!")
+        print(f"Training results: {training_results}")
+    else:
+        print("Using pre-trained flood prediction model")
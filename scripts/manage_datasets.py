@@ -7,17 +7,29 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from ml_model import FloodPredictionModel
+from ml_model import FloodPredictionModel, FLOOD_LEVELS
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import json
 from datetime import datetime
 
+# Set once the datasets directory exists, so repeated exports skip the mkdir
+_datasets_dir_ready = False
+
+def _ensure_datasets_dir():
+    """Create the datasets directory on first use"""
+    global _datasets_dir_ready
+    if not _datasets_dir_ready:
+        os.makedirs("datasets", exist_ok=True)
+        _datasets_dir_ready = True
+
 def main():
     print("🌊 SDSS Dataset Management Tool")
     print("=" * 50)
     
-    # Initialize model
-    model = FloodPredictionModel()
+    # Initialize model (trained models are written only via the save option)
+    model = FloodPredictionModel(autosave=False)
     
     while True:
         print("\nOptions:")
@@ -26,9 +38,10 @@ def main():
         print("3. Test model")
         print("4. View model info")
         print("5. Export dataset")
-        print("6. Exit")
+        print("6. Save model")
+        print("7. Exit")
         
-        choice = input("\nSelect option (1-6): ").strip()
+        choice = input("\nSelect option (1-7): ").strip()
         
         if choice == "1":
             generate_dataset(model)
@@ -41,6 +54,8 @@ def main():
         elif choice == "5":
             export_dataset(model)
         elif choice == "6":
+            save_model(model)
+        elif choice == "7":
             print("Goodbye! 👋")
             break
         else:
@@ -52,13 +67,13 @@ def generate_dataset(model):
         n_samples = int(input("Number of samples to generate (default 10000): ") or "10000")
         print(f"Generating {n_samples} samples...")
         
-        df = model.generate_synthetic_dataset(n_samples)
+        df = model.generate_synthetic_dataset(n_samples, include_timestamps=True)
         
         # Save dataset
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"datasets/flood_dataset_{timestamp}.csv"
-        os.makedirs("datasets", exist_ok=True)
-        df.to_csv(filename, index=False)
+        filename = f"datasets/flood_dataset_{timestamp}.parquet"
+        _ensure_datasets_dir()
+        save_parquet(df, filename)
         
         print(f"✅ Dataset generated and saved to {filename}")
         print(f"📊 Dataset info:")
@@ -76,7 +91,7 @@ def train_model(model):
         print("Training flood prediction model...")
         results = model.train_models()
         
-        print("✅ Model training completed!")
+        print("✅ Model training completed! (use option 6 to save it)")
         print(f"📈 Training results:")
         print(f"   - MSE: {results['mse']:.4f}")
         print(f"   - R²: {results['r2']:.4f}")
@@ -90,6 +105,19 @@ def train_model(model):
     except Exception as e:
         print(f"❌ Error training model: {e}")
 
+def save_model(model):
+    """Save the trained model to disk"""
+    try:
+        if not model.is_trained:
+            print("❌ Model not trained. Please train the model first.")
+            return
+        
+        model.save_models()
+        print(f"✅ Model saved to {model.model_path}")
+        
+    except Exception as e:
+        print(f"❌ Error saving model: {e}")
+
 def test_model(model):
     """Test the model with sample data"""
     try:
@@ -149,12 +177,14 @@ def view_model_info(model):
     try:
         print("📋 Model Information:")
         print(f"   - Trained: {'Yes' if model.is_trained else 'No'}")
-        print(f"   - Model type: {'GradientBoostingRegressor' if model.is_trained else 'Simple'}")
+        print(f"   - Model type: {'HistGradientBoostingRegressor' if model.is_trained else 'Simple'}")
         print(f"   - Model path: {model.model_path}")
         
         if model.is_trained and hasattr(model, 'flood_risk_model'):
             print(f"   - Features: {model.flood_risk_model.n_features_in_}")
-            print(f"   - Estimators: {model.flood_risk_model.n_estimators}")
+            # Histogram boosting reports fitted iterations; older pickles carry n_estimators
+            n_estimators = getattr(model.flood_risk_model, 'n_iter_', None) or model.flood_risk_model.n_estimators
+            print(f"   - Estimators: {n_estimators}")
         
         # Check for saved models
         model_files = []
@@ -171,29 +201,56 @@ def view_model_info(model):
     except Exception as e:
         print(f"❌ Error viewing model info: {e}")
 
+def _parquet_table(df):
+    """Arrow table for a dataset chunk"""
+    # Categorical levels are stored as a dictionary page instead of repeated strings
+    df = df.assign(flood_level=pd.Categorical(df['flood_level'], categories=FLOOD_LEVELS))
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+def save_parquet(df, filename):
+    """Save a dataset as Snappy-compressed Parquet"""
+    pq.write_table(_parquet_table(df), filename, compression='snappy')
+
+def stream_parquet(chunks, filename):
+    """Write dataset chunks as Parquet row groups, holding one chunk in memory at a time"""
+    writer = None
+    try:
+        for df in chunks:
+            table = _parquet_table(df)
+            if writer is None:
+                writer = pq.ParquetWriter(filename, table.schema, compression='snappy')
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
 def export_dataset(model):
     """Export dataset to different formats"""
     try:
         n_samples = int(input("Number of samples to export (default 1000): ") or "1000")
-        format_type = input("Export format (csv/json) [csv]: ").strip().lower() or "csv"
+        format_type = input("Export format (parquet/csv/json) [parquet]: ").strip().lower() or "parquet"
         
         print(f"Generating {n_samples} samples...")
-        df = model.generate_synthetic_dataset(n_samples)
-        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        os.makedirs("datasets", exist_ok=True)
+        _ensure_datasets_dir()
         
-        if format_type == "json":
-            filename = f"datasets/flood_dataset_{timestamp}.json"
-            df.to_json(filename, orient='records', indent=2)
+        if format_type in ("json", "csv"):
+            df = model.generate_synthetic_dataset(n_samples, include_timestamps=True)
+            filename = f"datasets/flood_dataset_{timestamp}.{format_type}"
+            if format_type == "json":
+                df.to_json(filename, orient='records', indent=2)
+            else:
+                df.to_csv(filename, index=False)
         else:
-            filename = f"datasets/flood_dataset_{timestamp}.csv"
-            df.to_csv(filename, index=False)
+            # Parquet is written shard by shard, so large exports never sit in memory whole
+            format_type = "parquet"
+            filename = f"datasets/flood_dataset_{timestamp}.parquet"
+            stream_parquet(model.iter_synthetic_dataset(n_samples, include_timestamps=True), filename)
         
         print(f"✅ Dataset exported to {filename}")
         print(f"📊 Export info:")
         print(f"   - Format: {format_type.upper()}")
-        print(f"   - Samples: {len(df)}")
+        print(f"   - Samples: {n_samples}")
         print(f"   - Size: {os.path.getsize(filename) / 1024:.1f} KB")
         
     except Exception as e:
@@ -80,11 +80,11 @@ def test_ml_model():
     
     try:
         sys.path.append(str(Path(__file__).parent.parent))
-        from ml_model import flood_model
+        from ml_model import get_model
         
         # Test model training with real data
         print("  - Testing model training with real weather data...")
-        results = flood_model.train_models(
+        results = get_model().train_models(
             use_real_data=True,
             latitude=52.52,
             longitude=13.41,
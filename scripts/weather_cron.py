@@ -6,15 +6,21 @@ Runs every hour to collect current weather data and update the model
 import os
 import sys
 import asyncio
-from datetime import datetime
+import argparse
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, TextIO
 import logging
 
+try:
+    import fcntl
+except ImportError:  # Windows: overlapping runs are not detected
+    fcntl = None
+
 # Add the project root to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from lib.weather_service import weather_ingestion
-from ml_model import flood_model
-
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -26,6 +32,22 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Seconds between collections when running as a daemon
+COLLECTION_INTERVAL = 3600
+
+# Overlapping runs skip while another holds the lock; a run within this long of the
+# last collection only checks whether to retrain
+CRON_LOCK_PATH = os.path.join(tempfile.gettempdir(), 'sdss_weather_cron.lock')
+CRON_LAST_COLLECTION_PATH = os.path.join(tempfile.gettempdir(), 'sdss_weather_cron.last')
+COLLECTION_MIN_INTERVAL = timedelta(minutes=50)
+
+# Retrain once this many new samples have arrived, or once the model is this old
+RETRAIN_MIN_NEW_SAMPLES = 50
+RETRAIN_MAX_AGE = timedelta(hours=24)
+
+# Between full refits the model only gains boosting rounds fit on the new readings
+FULL_REFIT_INTERVAL = timedelta(days=7)
+
 # Default locations to collect weather data for
 DEFAULT_LOCATIONS = [
     {"name": "Berlin", "lat": 52.52, "lon": 13.41},
@@ -35,49 +57,80 @@ DEFAULT_LOCATIONS = [
     {"name": "Sydney", "lat": -33.87, "lon": 151.21}
 ]
 
+# Column views of DEFAULT_LOCATIONS, built once for the batched fetch and the report loop
+DEFAULT_LOCATION_NAMES = [location['name'] for location in DEFAULT_LOCATIONS]
+DEFAULT_COORDINATES = [(location['lat'], location['lon']) for location in DEFAULT_LOCATIONS]
+
 def collect_weather_data():
     """Collect current weather data for all default locations"""
+    from lib.weather_service import weather_ingestion
+    
     logger.info("Starting weather data collection...")
     
+    # Fetch every location concurrently and store them with one insert
+    results = weather_ingestion.ingest_current_weather_for_locations(DEFAULT_COORDINATES)
+    
     success_count = 0
     error_count = 0
     
-    for location in DEFAULT_LOCATIONS:
-        try:
-            logger.info(f"Collecting weather data for {location['name']} ({location['lat']}, {location['lon']})")
-            
-            weather_data = weather_ingestion.ingest_current_weather(
-                location['lat'], location['lon']
-            )
-            
-            logger.info(f"✅ {location['name']}: {weather_data.temperature}°C, {weather_data.humidity}% humidity, {weather_data.precipitation}mm rain")
-            success_count += 1
-            
-        except Exception as e:
-            logger.error(f"❌ Failed to collect weather data for {location['name']}: {e}")
+    for name, result in zip(DEFAULT_LOCATION_NAMES, results):
+        if isinstance(result, Exception):
+            logger.error(f"❌ Failed to collect weather data for {name}: {result}")
             error_count += 1
+        else:
+            logger.info(f"✅ {name}: {result.temperature}°C, {result.humidity}% humidity, {result.precipitation}mm rain")
+            success_count += 1
     
     logger.info(f"Weather data collection completed: {success_count} successful, {error_count} errors")
     return success_count, error_count
 
 def retrain_model_if_needed():
     """Retrain the model if enough new data is available"""
+    from lib.weather_service import weather_ingestion
+    from ml_model import INCREMENTAL_CONTEXT, get_model, last_trained_at
+    
     try:
-        # Check if we should retrain (e.g., every 24 hours or when significant new data is available)
-        # For now, we'll retrain every time the cron runs, but in production you might want
-        # to implement a more sophisticated strategy
-        
         logger.info("Checking if model retraining is needed...")
         
         # Use Berlin as the primary location for training
         berlin_lat, berlin_lon = 52.52, 13.41
         
-        # Retrain with real data
+        # Skip the fit while the model is recent and little new data has arrived
+        trained_at = last_trained_at()
+        if trained_at is not None and datetime.now(timezone.utc) - trained_at < RETRAIN_MAX_AGE:
+            new_samples = weather_ingestion.count_new_samples(berlin_lat, berlin_lon, trained_at)
+            if new_samples < RETRAIN_MIN_NEW_SAMPLES:
+                logger.info(f"Skipping retraining: model trained at {trained_at}, {new_samples} new samples since")
+                return True
+        
+        # Refit from scratch weekly to correct drift, otherwise extend the model with new data only
+        flood_model = get_model()
+        full_refit_at = flood_model.full_refit_at
+        incremental = full_refit_at is not None and datetime.now(timezone.utc) - full_refit_at < FULL_REFIT_INTERVAL
+        
+        # Read the training window once through the ingestion service's client and hand it to the model
+        # (an incremental window reaches back far enough to complete the rainfall sums of the new rows)
+        incremental = incremental and trained_at is not None
+        if incremental:
+            days_back = (datetime.now(timezone.utc) - trained_at + INCREMENTAL_CONTEXT) / timedelta(days=1)
+        else:
+            days_back = 7
+        records = weather_ingestion.get_weather_data_for_training(berlin_lat, berlin_lon, days_back)
+        df = flood_model.build_weather_frame(records, since=trained_at if incremental else None) if records else None
+        
+        # Boosting needs new readings; without them the synthetic fallback would be fit instead
+        if incremental and (df is None or df.empty):
+            logger.info(f"Skipping retraining: no new weather readings since {trained_at}")
+            return True
+        
+        # Retrain with real data (train_models queries the database itself if nothing was found)
         training_results = flood_model.train_models(
+            df=df,
             use_real_data=True,
             latitude=berlin_lat,
             longitude=berlin_lon,
-            days_back=7  # Use last 7 days for frequent retraining
+            days_back=7,  # Full refits use the last 7 days
+            incremental=incremental
         )
         
         logger.info(f"✅ Model retrained successfully:")
@@ -91,18 +144,54 @@ def retrain_model_if_needed():
         logger.error(f"❌ Model retraining failed: {e}")
         return False
 
-def main():
-    """Main cron job function"""
+def _acquire_run_lock() -> Optional[TextIO]:
+    """Open and lock the run lock file, or return None while another run holds it"""
+    # flock is released by the OS when its holder exits, so a crashed run never leaves it held
+    lock_file = open(CRON_LOCK_PATH, 'a')
+    if fcntl:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+    return lock_file
+
+def _last_collection_time() -> Optional[datetime]:
+    """When a run last stored weather data, or None if no run has"""
+    try:
+        return datetime.fromtimestamp(os.path.getmtime(CRON_LAST_COLLECTION_PATH))
+    except OSError:
+        return None
+
+def run_collection() -> bool:
+    """Collect weather data and retrain if needed; returns False if the run failed"""
     logger.info("=" * 60)
     logger.info(f"Weather Data Collection Cron Job - {datetime.now()}")
     logger.info("=" * 60)
     
+    lock_file = _acquire_run_lock()
+    if lock_file is None:
+        logger.info("Another weather collection is still running, skipping this run")
+        return True
+    
     try:
+        # A run that finished moments ago already stored this hour's readings; only check the model
+        last_collection = _last_collection_time()
+        if last_collection is not None and datetime.now() - last_collection < COLLECTION_MIN_INTERVAL:
+            logger.info(f"Weather data collected at {last_collection}, skipping collection")
+            if not retrain_model_if_needed():
+                logger.warning("⚠️ Model retraining failed")
+            return True
+        
         # Step 1: Collect current weather data
         success_count, error_count = collect_weather_data()
         
         # Step 2: Retrain model if data collection was successful
         if success_count > 0:
+            # Record the collection so a run starting shortly after does not repeat it
+            with open(CRON_LAST_COLLECTION_PATH, 'w'):
+                pass
+            
             model_retrained = retrain_model_if_needed()
             
             if model_retrained:
@@ -112,8 +201,38 @@ def main():
         else:
             logger.error("❌ No weather data collected, skipping model retraining")
         
+        return True
+        
     except Exception as e:
         logger.error(f"❌ Cron job failed: {e}")
+        return False
+    
+    finally:
+        lock_file.close()  # Releases the lock
+
+def run_daemon(interval: int = COLLECTION_INTERVAL):
+    """Run a collection at the start of every interval in one long-lived process"""
+    # Imports, the model and compiled kernels are loaded once instead of on every run
+    from ml_model import get_model
+    get_model()
+    logger.info(f"Weather collection daemon started, running every {interval} seconds")
+    
+    while True:
+        run_collection()
+        time.sleep(interval - time.time() % interval)
+
+def main():
+    """Main cron job function"""
+    parser = argparse.ArgumentParser(description='Hourly weather data collection and model retraining')
+    parser.add_argument('--daemon', action='store_true', help='Keep running and collect every hour instead of once')
+    args = parser.parse_args()
+    
+    if args.daemon:
+        try:
+            run_daemon()
+        except KeyboardInterrupt:
+            logger.info("Weather collection daemon stopped")
+    elif not run_collection():
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -8,12 +8,19 @@ import sys
 import asyncio
 from datetime import datetime, timedelta
 import argparse
+import logging
+import numpy as np
 
 # Add the project root to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from lib.weather_service import weather_ingestion
-from ml_model import flood_model
+# Pipeline progress goes to stdout unadorned, separate from the library loggers' records
+logger = logging.getLogger("sdss.pipeline")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_handler = logging.StreamHandler(sys.stdout)
+_handler.setFormatter(logging.Formatter('%(message)s'))
+logger.addHandler(_handler)
 
 def main():
     parser = argparse.ArgumentParser(description='Weather Data Training Pipeline')
@@ -23,73 +30,92 @@ def main():
     parser.add_argument('--ingest-only', action='store_true', help='Only ingest data, do not train model')
     parser.add_argument('--train-only', action='store_true', help='Only train model, do not ingest data')
     parser.add_argument('--synthetic', action='store_true', help='Use synthetic data instead of real weather data')
+    parser.add_argument('--no-cache', action='store_true', help='Refetch weather instead of using the on-disk response cache')
     
     args = parser.parse_args()
     
-    print("🌊 SDSS Weather Data Training Pipeline")
-    print("=" * 50)
-    print(f"Location: {args.latitude}, {args.longitude}")
-    print(f"Days back: {args.days_back}")
-    print(f"Mode: {'Ingest only' if args.ingest_only else 'Train only' if args.train_only else 'Full pipeline'}")
-    print()
+    # Heavy imports wait until the arguments are valid, so --help and usage errors return at once
+    if not args.train_only:
+        from lib.weather_service import weather_ingestion
+    if not args.ingest_only:
+        from ml_model import get_model
+    
+    logger.info("🌊 SDSS Weather Data Training Pipeline")
+    logger.info("=" * 50)
+    logger.info(f"Location: {args.latitude}, {args.longitude}")
+    logger.info(f"Days back: {args.days_back}")
+    logger.info(f"Mode: {'Ingest only' if args.ingest_only else 'Train only' if args.train_only else 'Full pipeline'}")
+    logger.info("")
     
     try:
         # Step 1: Ingest weather data (unless train-only mode)
         if not args.train_only:
-            print("📡 Step 1: Ingesting weather data from Open-Meteo...")
+            logger.info("📡 Step 1: Ingesting weather data from Open-Meteo...")
             
             # Ingest current weather
-            print("  - Fetching current weather...")
-            current_weather = weather_ingestion.ingest_current_weather(args.latitude, args.longitude)
-            print(f"  ✅ Current weather ingested: {current_weather.temperature}°C, {current_weather.humidity}% humidity")
+            logger.info("  - Fetching current weather...")
+            current_weather = weather_ingestion.ingest_current_weather(
+                args.latitude, args.longitude, use_cache=not args.no_cache
+            )
+            logger.info(f"  ✅ Current weather ingested: {current_weather.temperature}°C, {current_weather.humidity}% humidity")
             
             # Ingest historical weather
             end_date = datetime.now().strftime('%Y-%m-%d')
             start_date = (datetime.now() - timedelta(days=args.days_back)).strftime('%Y-%m-%d')
             
-            print(f"  - Fetching historical weather ({start_date} to {end_date})...")
+            logger.info(f"  - Fetching historical weather ({start_date} to {end_date})...")
             historical_weather = weather_ingestion.ingest_historical_weather(
-                args.latitude, args.longitude, start_date, end_date
+                args.latitude, args.longitude, start_date, end_date, use_cache=not args.no_cache
             )
-            print(f"  ✅ Historical weather ingested: {len(historical_weather)} records")
+            logger.info(f"  ✅ Historical weather ingested: {len(historical_weather)} records")
             
-            print("✅ Weather data ingestion completed!")
-            print()
+            logger.info("✅ Weather data ingestion completed!")
+            logger.info("")
         
         # Step 2: Train the model (unless ingest-only mode)
         if not args.ingest_only:
-            print("🤖 Step 2: Training flood prediction model...")
+            logger.info("🤖 Step 2: Training flood prediction model...")
             
             if args.synthetic:
-                print("  - Using synthetic data for training...")
-                training_results = flood_model.train_models(use_real_data=False)
+                logger.info("  - Using synthetic data for training...")
+                training_results = get_model().train_models(use_real_data=False)
             else:
-                print("  - Using real weather data for training...")
-                training_results = flood_model.train_models(
+                logger.info("  - Using real weather data for training...")
+                training_results = get_model().train_models(
                     use_real_data=True,
                     latitude=args.latitude,
                     longitude=args.longitude,
                     days_back=args.days_back
                 )
             
-            print("✅ Model training completed!")
-            print(f"  - R² Score: {training_results['r2']:.4f}")
-            print(f"  - MSE: {training_results['mse']:.4f}")
-            print(f"  - Samples used: {training_results['n_samples']}")
-            print()
+            logger.info("✅ Model training completed!")
+            logger.info(f"  - R² Score: {training_results['r2']:.4f}")
+            logger.info(f"  - MSE: {training_results['mse']:.4f}")
+            logger.info(f"  - Samples used: {training_results['n_samples']}")
+            logger.info("")
             
             # Display feature importance
-            print("🔍 Top 5 Most Important Features:")
             feature_importance = training_results['feature_importance']
-            sorted_features = sorted(feature_importance.items(), key=lambda x: x[1], reverse=True)
-            for i, (feature, importance) in enumerate(sorted_features[:5], 1):
-                print(f"  {i}. {feature}: {importance:.4f}")
-            print()
+            names = np.array(list(feature_importance.keys()))
+            values = np.array(list(feature_importance.values()))
+            
+            # Partially sort for the top 5 instead of ordering every feature
+            top_count = min(5, len(values))
+            top_idx = np.argpartition(-values, top_count - 1)[:top_count] if top_count else np.empty(0, dtype=int)
+            top_idx = top_idx[np.argsort(-values[top_idx])]
+            
+            # Emit the whole block as one record rather than one write per feature
+            logger.info("\n".join(
+                ["🔍 Top 5 Most Important Features:"]
+                + [f"  {i}. {feature}: {importance:.4f}"
+                   for i, (feature, importance) in enumerate(zip(names[top_idx], values[top_idx]), 1)]
+                + [""]
+            ))
         
-        print("🎉 Pipeline completed successfully!")
+        logger.info("🎉 Pipeline completed successfully!")
         
     except Exception as e:
-        print(f"❌ Pipeline failed: {e}")
+        logger.error(f"❌ Pipeline failed: {e}")
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -13,7 +13,7 @@ if not exist ".env.local" (
 REM Check if Python is available
 python --version >nul 2>&1
 if errorlevel 1 (
-    echo ❌ Python not found! Please install Python 3.8+
+    echo ❌ Python not found! Please install Python 3.9+
     pause
     exit /b 1
 )
@@ -13,7 +13,7 @@ fi
 
 # Check if Python is available
 if ! command -v python &> /dev/null; then
-    echo "❌ Python not found! Please install Python 3.8+"
+    echo "❌ Python not found! Please install Python 3.9+"
     exit 1
 fi
 
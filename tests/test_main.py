@@ -0,0 +1,74 @@
+"""
+Tests for micro-batched /predict model calls
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+
+class _StubPipeline:
+    """Records model calls; each row's flood risk is its first feature"""
+    
+    is_trained = True
+    type_name = "Stub"
+    
+    def __init__(self):
+        self.batches = []
+        self.prediction_inputs = []
+    
+    def cached_prediction(self, features):
+        return None
+    
+    def predict_rows(self, rows):
+        self.batches.append(list(rows))
+        return [row[0] / 100 for row in rows]
+    
+    def feature_row(self, conditions, state_code=None):
+        return (conditions['rainfall_24h'],)
+    
+    def predict_flood_risk(self, conditions, state_code=None, flood_risk=None):
+        self.prediction_inputs.append(flood_risk)
+        if flood_risk is None:
+            flood_risk = self.predict_rows([self.feature_row(conditions)])[0]
+        return {'flood_risk': flood_risk, 'confidence': 0.8, 'recommendations': []}
+
+
+def test_concurrent_rows_are_predicted_in_one_call(monkeypatch):
+    pipeline = _StubPipeline()
+    monkeypatch.setattr(main, 'nigeria_ml_pipeline', pipeline)
+    
+    async def run():
+        batcher = main.PredictionBatcher(max_batch_size=8, max_wait=0.05)
+        batcher.start()
+        try:
+            return await asyncio.gather(*[batcher.predict((float(i),)) for i in range(5)])
+        finally:
+            await batcher.stop()
+    
+    assert asyncio.run(run()) == [0.0, 0.01, 0.02, 0.03, 0.04]
+    assert pipeline.batches == [[(0.0,), (1.0,), (2.0,), (3.0,), (4.0,)]]
+
+
+def test_async_prediction_uses_the_batched_flood_risk(monkeypatch):
+    pipeline = _StubPipeline()
+    monkeypatch.setattr(main, 'nigeria_ml_pipeline', pipeline)
+    monkeypatch.setattr(main, '_prediction_batcher', main.PredictionBatcher())
+    main._clear_prediction_caches()
+    conditions = {key: 40.0 for key in main.DEFAULT_CONDITION_RANGES}
+    
+    async def run():
+        main._prediction_batcher.start()
+        try:
+            return await main.calculate_nigeria_flood_risk_async([6], conditions, 'LA')
+        finally:
+            await main._prediction_batcher.stop()
+    
+    asyncio.run(run())
+    
+    # One batched model call, handed to the response builder rather than predicted again
+    assert pipeline.batches == [[(40.0,)]]
+    assert pipeline.prediction_inputs == [0.4]
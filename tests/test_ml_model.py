@@ -0,0 +1,82 @@
+"""
+Tests for incremental training of the flood prediction model
+"""
+import os
+import sys
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_model import FloodPredictionModel, last_trained_at
+
+
+def _weather_records(start, hours):
+    """Hourly weather records shaped like the readings grouped for training"""
+    rng = np.random.default_rng(0)
+    return [
+        {
+            'timestamp': (start + timedelta(hours=i)).isoformat(),
+            'temperature': float(rng.normal(25, 5)),
+            'humidity': float(rng.uniform(40, 95)),
+            'pressure': float(rng.normal(1013, 10)),
+            'wind_speed': float(rng.exponential(3)),
+            'precipitation': float(rng.exponential(2)),
+        }
+        for i in range(hours)
+    ]
+
+
+@pytest.fixture
+def trained_model(tmp_path, monkeypatch):
+    """A model fully fit on synthetic data, saved under a temporary models/ directory"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('NEXT_PUBLIC_SUPABASE_URL', raising=False)
+    model = FloodPredictionModel()
+    model.train_models(df=model.generate_synthetic_dataset(2000))
+    return model
+
+
+def test_build_weather_frame_labels_and_keeps_rainfall_context(trained_model):
+    trained_at = last_trained_at(trained_model.model_path)
+    records = _weather_records(trained_at - timedelta(hours=5, minutes=30), 30)
+    
+    full = trained_model.build_weather_frame(records)
+    delta = trained_model.build_weather_frame(records, since=trained_at)
+    
+    assert len(delta) == 24
+    assert delta['flood_risk'].between(0, 1).all()
+    # The first new rows still sum the 6 readings that preceded the last training
+    np.testing.assert_allclose(delta['rainfall_7d'].to_numpy(), full['rainfall_7d'].to_numpy()[6:])
+
+
+def test_incremental_fit_adds_boosting_rounds(trained_model):
+    rounds_before = trained_model.flood_risk_model.n_iter_
+    full_refit_at = trained_model.full_refit_at
+    trained_at = last_trained_at(trained_model.model_path)
+    df = trained_model.build_weather_frame(
+        _weather_records(trained_at - timedelta(hours=5, minutes=30), 200), since=trained_at
+    )
+    
+    results = trained_model.train_models(df=df, incremental=True)
+    
+    assert results['n_samples'] == len(df)
+    assert results['feature_importance'] is None  # Only full fits pay for permutation importance
+    assert trained_model.flood_risk_model.n_iter_ > rounds_before
+    assert trained_model.full_refit_at == full_refit_at
+    
+    # The boosted model is what gets saved and reloaded
+    reloaded = FloodPredictionModel()
+    assert reloaded.flood_risk_model.n_iter_ == trained_model.flood_risk_model.n_iter_
+
+
+def test_incremental_fit_skips_synthetic_and_empty_frames(trained_model):
+    rounds_before = trained_model.flood_risk_model.n_iter_
+    trained_at = last_trained_at(trained_model.model_path)
+    empty = trained_model.build_weather_frame(_weather_records(trained_at - timedelta(hours=5, minutes=30), 6), since=trained_at)
+    
+    assert trained_model.train_models(df=trained_model.generate_synthetic_dataset(500), incremental=True) is None
+    assert trained_model.train_models(df=empty, incremental=True) is None
+    assert trained_model.flood_risk_model.n_iter_ == rounds_before
@@ -0,0 +1,33 @@
+"""
+Tests for saving and reloading the Nigeria training pipeline
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.ml_training_pipeline import NigeriaMLTrainingPipeline, TrainingConfig
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    """Run against an empty models/ directory without database access"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('NEXT_PUBLIC_SUPABASE_URL', raising=False)
+    return tmp_path / 'models'
+
+
+def test_saved_model_is_reused_by_a_default_pipeline(model_dir):
+    config = TrainingConfig(model_type='random_forest', n_estimators=10, cross_validation_folds=2)
+    pipeline = NigeriaMLTrainingPipeline(config)
+    df = pipeline.generate_nigeria_synthetic_dataset(2000)
+    pipeline.train_model(df=df, use_real_data=False)
+    
+    # A restart builds the pipeline with the default config
+    reloaded = NigeriaMLTrainingPipeline()
+    
+    assert reloaded.is_trained
+    assert type(reloaded.model).__name__ == 'RandomForestRegressor'
+    assert reloaded.train_if_needed(lock_path=str(model_dir / 'train.lock')) is None